@@ -0,0 +1,85 @@
+"""
+Read-path throughput benchmark.
+
+Hammers the read-heavy endpoints of a running API with concurrent clients and
+reports requests/s and latency percentiles per endpoint. Run it against a build
+before and after a change (same data, same worker count) to compare.
+
+Usage (from the 'backend' folder):
+    python benchmarks/bench_async_reads.py --base-url http://127.0.0.1:8000 --token <JWT> \
+        --concurrency 64 --requests 2000
+"""
+import argparse
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENDPOINTS = [
+    "/dashboard/aggregate",
+    "/dashboard/history?period=1Y",
+    "/dashboard/summary",
+    "/dashboard/allocation",
+    "/dashboard/goals-progress",
+    "/investments",
+    "/transactions?limit=50",
+    "/goals",
+]
+
+
+def _request(url: str, token: str) -> float:
+    """Issue one GET and return its latency in milliseconds."""
+    req = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return (time.perf_counter() - start) * 1000
+
+
+def bench_endpoint(base_url: str, path: str, token: str, concurrency: int, requests: int) -> dict:
+    """Run `requests` GETs of one endpoint with `concurrency` clients in flight."""
+    url = base_url.rstrip("/") + path
+    # Warm up the connection pools and snapshots
+    for _ in range(min(concurrency, 10)):
+        _request(url, token)
+
+    errors = 0
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(_request, url, token) for _ in range(requests)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "endpoint": path,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2) if latencies else None,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark read endpoints under concurrent load")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", required=True, help="Bearer token of a seeded user")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per endpoint")
+    parser.add_argument("--endpoint", action="append", help="Endpoint to test (repeatable, default: all read routes)")
+    args = parser.parse_args()
+
+    print(f"🏁 {args.requests} requests per endpoint, concurrency {args.concurrency}")
+    print(f"{'endpoint':<32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    for path in args.endpoint or DEFAULT_ENDPOINTS:
+        r = bench_endpoint(args.base_url, path, args.token, args.concurrency, args.requests)
+        print(f"{r['endpoint']:<32} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Write-path throughput benchmark for POST /transactions.
+
+Sends concurrent buys from one user - all on one hot symbol (worst-case row
+contention) or spread over several - and reports requests/s and latency
+percentiles. Afterwards it checks that the positions grew by exactly the units
+bought, which catches lost updates between concurrent trades.
+
+Usage (from the 'backend' folder, against a test user - the trades are kept):
+    python benchmarks/bench_create_transaction.py --base-url http://127.0.0.1:8000 --token <JWT> \
+        --concurrency 32 --requests 2000 --symbols 1
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _call(base_url: str, token: str, method: str, path: str, payload=None):
+    """Issue one request and return (latency in ms, decoded JSON body)."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(
+        base_url.rstrip("/") + path,
+        data=data,
+        method=method,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        body = json.loads(resp.read() or b"null")
+    return (time.perf_counter() - start) * 1000, body
+
+
+def held_units(base_url: str, token: str, symbols) -> dict:
+    _, investments = _call(base_url, token, "GET", "/investments")
+    units = {investment["symbol"]: float(investment["units"]) for investment in investments}
+    return {symbol: units.get(symbol, 0.0) for symbol in symbols}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark POST /transactions under concurrent load")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", required=True, help="Bearer token of a test user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--symbols", type=int, default=1, help="Spread the buys over this many symbols")
+    parser.add_argument("--prefix", default="BENCHTX", help="Symbol prefix of the benchmark positions")
+    args = parser.parse_args()
+
+    symbols = [f"{args.prefix}{i}" for i in range(args.symbols)]
+    before = held_units(args.base_url, args.token, symbols)
+
+    def buy(i: int) -> float:
+        latency, _ = _call(args.base_url, args.token, "POST", "/transactions", {
+            "symbol": symbols[i % len(symbols)], "type": "buy", "quantity": 1,
+            "price": 100 + i % 10, "fees": 0.5
+        })
+        return latency
+
+    print(f"🏁 {args.requests} buys over {len(symbols)} symbols, concurrency {args.concurrency}")
+    errors = 0
+    latencies = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(buy, i) for i in range(args.requests)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    if latencies:
+        print(
+            f"req/s {len(latencies) / elapsed:.1f}   p50 {statistics.median(latencies):.2f} ms   "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms   errors {errors}"
+        )
+
+    after = held_units(args.base_url, args.token, symbols)
+    expected = {symbol: 0 for symbol in symbols}
+    for i in range(len(latencies)):
+        expected[symbols[i % len(symbols)]] += 1
+    # Failed requests may or may not have committed, so only check clean runs exactly
+    lost = {
+        symbol: expected[symbol] - (after[symbol] - before[symbol])
+        for symbol in symbols
+        if not errors and after[symbol] - before[symbol] != expected[symbol]
+    }
+    print("✅ No lost updates" if not lost else f"❌ Units missing per symbol: {lost}")
+
+
+if __name__ == "__main__":
+    main()
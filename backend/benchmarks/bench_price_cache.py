@@ -0,0 +1,85 @@
+"""
+Benchmark of the Redis price cache layouts ("json" string keys vs packed "hash").
+
+Writes synthetic quotes for --symbols made-up tickers (half NSE, half US) in
+each layout, then reports Redis memory used and the time of bulk reads through
+PriceService's read path. The benchmark keys are deleted afterwards.
+
+Usage (from the 'backend' folder, with REDIS_URL / REDIS_HOST set):
+    python benchmarks/bench_price_cache.py --symbols 5000 --rounds 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_prices(count: int, seed: int):
+    from services.price_providers import build_price_data
+
+    rng = random.Random(seed)
+    prices = {}
+    for i in range(count):
+        symbol = f"BENCH{i:05d}" + (".NS" if i % 2 else "")
+        previous_close = round(rng.uniform(10, 3000), 2)
+        prices[symbol] = build_price_data(symbol, previous_close * rng.uniform(0.95, 1.05), previous_close)
+    return prices
+
+
+def bench_layout(layout: str, prices, rounds: int):
+    import services.price_service as price_service
+
+    price_service.PRICE_CACHE_LAYOUT = layout
+    service = price_service.PriceService()
+    client = service._redis()
+    if not client:
+        sys.exit("Redis is required for this benchmark")
+    symbols = list(prices)
+    if layout == "hash":
+        keys = {service._get_hash_key(price_service.exchange_for_symbol(symbol)) for symbol in symbols}
+    else:
+        keys = {service._get_cache_key(symbol) for symbol in symbols}
+
+    try:
+        start = time.perf_counter()
+        service.set_prices_in_cache(prices)
+        write_ms = (time.perf_counter() - start) * 1000
+
+        memory = sum(client.memory_usage(key) or 0 for key in keys)
+
+        read_ms = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            found = service._read_redis(client, symbols)
+            read_ms.append((time.perf_counter() - start) * 1000)
+        assert len(found) == len(symbols), f"{layout}: read {len(found)} of {len(symbols)}"
+    finally:
+        client.delete(*keys)
+
+    print(
+        f"{layout:>5}: {len(keys):>6} keys, {memory / 1024:>9.1f} KiB "
+        f"({memory / len(symbols):.0f} B/symbol), write {write_ms:.1f} ms, "
+        f"read best {min(read_ms):.1f} ms / avg {sum(read_ms) / len(read_ms):.1f} ms"
+    )
+
+
+def main():
+    from services.redis_pool import init_redis_pool
+
+    init_redis_pool()
+    parser = argparse.ArgumentParser(description="Compare the Redis price cache layouts")
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    prices = synthetic_prices(args.symbols, args.seed)
+    for layout in ("json", "hash"):
+        bench_layout(layout, prices, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Offline benchmark of the nightly price update job.
+
+Runs update_all_investment_prices against the configured database with the
+replay price provider, so no network access is needed. Without --file, a
+synthetic recording is generated for every symbol currently held.
+
+Usage (from the 'backend' folder):
+    python benchmarks/bench_price_update.py --latency-ms 150 --jitter-ms 50 --rounds 3
+
+The price endpoints can be benchmarked the same way: start the API with
+PRICE_PROVIDER=replay and PRICE_REPLAY_FILE set, then point
+benchmarks/bench_async_reads.py at /investments/price/<symbol>.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_synthetic_recording(path: str, seed: int):
+    """Record one random quote for every symbol currently held."""
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT DISTINCT symbol FROM investments ORDER BY symbol")
+    symbols = [row["symbol"] for row in cur.fetchall()]
+    cur.close()
+    conn.close()
+
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["symbol", "price", "previous_close"])
+        for symbol in symbols:
+            previous_close = round(rng.uniform(10, 3000), 2)
+            writer.writerow([symbol, round(previous_close * rng.uniform(0.95, 1.05), 2), previous_close])
+    return len(symbols)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark update_all_investment_prices offline")
+    parser.add_argument("--file", help="Recorded quotes (.csv / .parquet); generated if omitted")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Injected latency per provider call")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra random latency per provider call")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--incremental", action="store_true", help="Skip recently repriced symbols (nightly mode)")
+    args = parser.parse_args()
+
+    path = args.file
+    if not path:
+        path = os.path.join(tempfile.gettempdir(), "price_replay.csv")
+        count = write_synthetic_recording(path, args.seed)
+        print(f"📼 Recorded {count} synthetic quotes to {path}")
+
+    # The provider is picked up from the environment when PriceService is built
+    os.environ["PRICE_PROVIDER"] = "replay"
+    os.environ["PRICE_REPLAY_FILE"] = path
+    os.environ["PRICE_REPLAY_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["PRICE_REPLAY_JITTER_MS"] = str(args.jitter_ms)
+    os.environ["PRICE_REPLAY_SEED"] = str(args.seed)
+    from services.price_service import update_all_investment_prices
+
+    for i in range(args.rounds):
+        start = time.perf_counter()
+        result = update_all_investment_prices(incremental=args.incremental)
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        print(
+            f"🏁 Round {i + 1}: {elapsed} ms total, {result['updated']} rows written, "
+            f"{result.get('skipped_unchanged', 0)} unchanged, {result.get('skipped_fresh', 0)} fresh symbols skipped, "
+            f"phases {result.get('timings')}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,8 +28,34 @@ celery_app.conf.update(
             "task": "daily_price_update",
             "schedule": crontab(hour=12, minute=30),  # 12:30 UTC = 18:00 IST
         },
+        "ingest-price-history": {
+            "task": "ingest_price_history",
+            "schedule": crontab(hour=12, minute=45),  # After the daily price update
+        },
+        "compact-portfolio-history": {
+            "task": "compact_portfolio_history",
+            "schedule": crontab(hour=13, minute=0),  # After the daily price update
+        },
+        "precompute-goal-progress": {
+            "task": "precompute_goal_progress",
+            "schedule": crontab(hour=0, minute=30),  # Nightly, after the month rolls over
+        },
     },
 )
 
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Give every worker process its own Redis pool (pools must not cross a fork)."""
+    from services.redis_pool import init_redis_pool
+    init_redis_pool()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    from services.redis_pool import close_redis_pool
+    close_redis_pool()
+
+
 if __name__ == "__main__":
     celery_app.start()
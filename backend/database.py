@@ -1,7 +1,11 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncpg
+import json
 import os
+import re
 
 # Load environment variables FIRST
 load_dotenv()
@@ -12,23 +16,29 @@ from psycopg2 import pool
 # Global pool variable
 pg_pool = None
 
+# Connections the sync pool opens at most; getconn raises PoolError beyond that
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 20))
+
 def init_db_pool():
-    """Initialize the database connection pool."""
+    """
+    Initialize the database connection pool.
+    Thread-safe: sync routes and the concurrent dashboard mode share it across threads.
+    """
     global pg_pool
     if pg_pool is None:
         try:
             database_url = os.getenv("DATABASE_URL")
             if database_url:
-                pg_pool = pool.SimpleConnectionPool(
+                pg_pool = pool.ThreadedConnectionPool(
                     minconn=1,
-                    maxconn=20,
+                    maxconn=DB_POOL_MAX,
                     dsn=database_url,
                     cursor_factory=RealDictCursor
                 )
             else:
-                pg_pool = pool.SimpleConnectionPool(
+                pg_pool = pool.ThreadedConnectionPool(
                     minconn=1,
-                    maxconn=20,
+                    maxconn=DB_POOL_MAX,
                     host=os.getenv("DB_HOST"),
                     port=os.getenv("DB_PORT"),
                     database=os.getenv("DB_NAME"),
@@ -70,6 +80,13 @@ class ConnectionWrapper:
         return getattr(self.conn, name)
 
 
+def db_pool_headroom() -> int:
+    """Connections the sync pool can still hand out right now (a hint: other threads race for them)."""
+    if not pg_pool:
+        return DB_POOL_MAX
+    return DB_POOL_MAX - len(pg_pool._used)
+
+
 def get_db_connection():
     """
     Get a connection from the global pool.
@@ -84,6 +101,120 @@ def get_db_connection():
     return ConnectionWrapper(conn, pg_pool)
 
 
+# ==================== ASYNC (asyncpg) ====================
+
+# Global asyncpg pool, used by the async read routes
+async_pg_pool = None
+
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", 10))
+
+_PLACEHOLDER_RE = re.compile(r"%\((\w+)\)s|%s")
+
+
+async def _init_async_connection(conn):
+    """Decode JSON columns the same way psycopg2 does."""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def init_async_db_pool():
+    """Initialize the asyncpg connection pool (called from the FastAPI lifespan)."""
+    global async_pg_pool
+    if async_pg_pool is None:
+        try:
+            database_url = os.getenv("DATABASE_URL")
+            if database_url:
+                async_pg_pool = await asyncpg.create_pool(
+                    dsn=database_url,
+                    min_size=1,
+                    max_size=ASYNC_DB_POOL_MAX,
+                    init=_init_async_connection
+                )
+            else:
+                async_pg_pool = await asyncpg.create_pool(
+                    host=os.getenv("DB_HOST"),
+                    port=os.getenv("DB_PORT"),
+                    database=os.getenv("DB_NAME"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    ssl=os.getenv("DB_SSLMODE", "prefer"),
+                    min_size=1,
+                    max_size=ASYNC_DB_POOL_MAX,
+                    init=_init_async_connection
+                )
+            print("✅ Async database connection pool initialized")
+        except Exception as e:
+            print(f"❌ Error initializing async database pool: {e}")
+            raise e
+
+
+async def close_async_db_pool():
+    """Close all connections in the asyncpg pool."""
+    global async_pg_pool
+    if async_pg_pool:
+        await async_pg_pool.close()
+        async_pg_pool = None
+        print("✅ Async database connection pool closed")
+
+
+@asynccontextmanager
+async def get_async_db_connection():
+    """
+    Acquire an asyncpg connection from the global pool.
+    Usage: async with get_async_db_connection() as conn: ...
+    """
+    if not async_pg_pool:
+        # Fallback if pool is not initialized (e.g. scripts)
+        await init_async_db_pool()
+
+    async with async_pg_pool.acquire() as conn:
+        yield conn
+
+
+def to_asyncpg_query(query: str, params=None):
+    """
+    Convert a psycopg2-style query (%s or %(name)s placeholders) to asyncpg's
+    numbered $n placeholders, so the same SQL serves both drivers.
+
+    Returns:
+        (query, args) ready for conn.fetch(query, *args)
+    """
+    if params is None:
+        return query, []
+
+    args = []
+    if isinstance(params, dict):
+        positions = {}
+
+        def replace(match):
+            name = match.group(1)
+            if name not in positions:
+                args.append(params[name])
+                positions[name] = len(args)
+            return f"${positions[name]}"
+    else:
+        values = iter(params)
+
+        def replace(match):
+            args.append(next(values))
+            return f"${len(args)}"
+
+    return _PLACEHOLDER_RE.sub(replace, query), args
+
+
+async def async_fetch_all(conn, query: str, params=None) -> list:
+    """Run a psycopg2-style query on an asyncpg connection and return a list of dicts."""
+    query, args = to_asyncpg_query(query, params)
+    return [dict(row) for row in await conn.fetch(query, *args)]
+
+
+async def async_fetch_one(conn, query: str, params=None):
+    """Run a psycopg2-style query on an asyncpg connection and return one dict (or None)."""
+    query, args = to_asyncpg_query(query, params)
+    row = await conn.fetchrow(query, *args)
+    return dict(row) if row else None
+
+
 def create_tables():
     """
     Create database tables for the Wealth Management API.
@@ -163,7 +294,7 @@ def create_tables():
         quantity NUMERIC NOT NULL,
         price NUMERIC NOT NULL,
         fees NUMERIC DEFAULT 0,
-        executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        executed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
     );
     """)
 
@@ -220,6 +351,194 @@ def create_tables():
     );
     """)
 
+    # Portfolio History Rollups table (weekly / monthly tiers, closing value per period)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS portfolio_history_rollups (
+        user_id INT REFERENCES users(id) ON DELETE CASCADE,
+        tier VARCHAR(10)
+            CHECK (tier IN ('weekly', 'monthly')) NOT NULL,
+        period_start DATE NOT NULL,
+        date DATE NOT NULL,
+        total_value NUMERIC NOT NULL,
+        total_invested NUMERIC NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, tier, period_start)
+    );
+    """)
+
+    # Price History table (daily OHLC per symbol, bulk-ingested from the price provider)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS price_history (
+        symbol VARCHAR(20) NOT NULL,
+        date DATE NOT NULL,
+        open NUMERIC,
+        high NUMERIC,
+        low NUMERIC,
+        close NUMERIC NOT NULL,
+        adj_close NUMERIC,
+        volume BIGINT,
+        PRIMARY KEY (symbol, date)
+    );
+    """)
+
+    # Goal Progress table (precomputed nightly for every active goal)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS goal_progress (
+        goal_id INT PRIMARY KEY REFERENCES goals(id) ON DELETE CASCADE,
+        user_id INT REFERENCES users(id) ON DELETE CASCADE,
+        months_elapsed INTEGER NOT NULL,
+        current_saved NUMERIC NOT NULL,
+        percent NUMERIC NOT NULL,
+        months_remaining INTEGER NOT NULL,
+        computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # User Data Versions table (bumped by every write, per dashboard section)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_data_versions (
+        user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        version BIGINT NOT NULL DEFAULT 0,
+        goals_version BIGINT NOT NULL DEFAULT 0,
+        investments_version BIGINT NOT NULL DEFAULT 0,
+        transactions_version BIGINT NOT NULL DEFAULT 0,
+        history_version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Dashboard Snapshots table (materialized /dashboard/aggregate payload per user)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS dashboard_snapshots (
+        user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        payload JSONB NOT NULL,
+        data_version BIGINT NOT NULL DEFAULT 0,
+        built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # User Portfolio Summary table (per-user rollup of the investments table)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS user_portfolio_summary (
+        user_id INT PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+        total_investments INTEGER NOT NULL DEFAULT 0,
+        total_invested NUMERIC NOT NULL DEFAULT 0,
+        total_value NUMERIC NOT NULL DEFAULT 0,
+        allocation JSONB NOT NULL DEFAULT '{}',
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    """)
+
+    # Stamp rows with the data version that wrote them (delta sync)
+    cur.execute("""
+    ALTER TABLE transactions
+    ADD COLUMN IF NOT EXISTS data_version BIGINT DEFAULT 0;
+    """)
+    cur.execute("""
+    ALTER TABLE portfolio_history
+    ADD COLUMN IF NOT EXISTS data_version BIGINT DEFAULT 0;
+    """)
+
+    # Keyset pagination orders and seeks on (executed_at, id), which NULLs would
+    # break; older tables allowed them. One-off backfill: undated trades become
+    # the user's oldest (their earliest dated trade, else the epoch).
+    cur.execute("""
+    SELECT is_nullable FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = 'transactions' AND column_name = 'executed_at';
+    """)
+    if cur.fetchone()["is_nullable"] == "YES":
+        cur.execute("""
+        UPDATE transactions t
+        SET executed_at = COALESCE(
+            (SELECT MIN(d.executed_at) FROM transactions d WHERE d.user_id = t.user_id),
+            TIMESTAMP 'epoch'
+        )
+        WHERE t.executed_at IS NULL;
+        ALTER TABLE transactions ALTER COLUMN executed_at SET NOT NULL;
+        """)
+
+    # Keyset pagination indexes for transaction listings (newest first)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_executed
+    ON transactions (user_id, executed_at DESC, id DESC);
+    """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_transactions_user_symbol_executed
+    ON transactions (user_id, symbol, executed_at DESC, id DESC);
+    """)
+
+    # Symbols are stored upper-cased (normalized at write time) so bulk price
+    # updates join on a plain index instead of UPPER(symbol). One-off migration,
+    # guarded by the CHECK constraints it ends with (a catalog lookup afterwards).
+    cur.execute("""
+    SELECT COUNT(*) AS done FROM pg_constraint
+    WHERE conname IN ('investments_symbol_upper', 'transactions_symbol_upper');
+    """)
+    if cur.fetchone()["done"] < 2:
+        # Fold positions that only differ in case into one row per user and
+        # symbol (the upper-cased one if present), so none is left unpriced
+        cur.execute("""
+        WITH variants AS (
+            SELECT id, units, cost_basis, current_value,
+                   FIRST_VALUE(id) OVER (
+                       PARTITION BY user_id, UPPER(symbol)
+                       ORDER BY (symbol = UPPER(symbol)) DESC, id
+                   ) AS keeper_id
+            FROM investments
+            WHERE (user_id, UPPER(symbol)) IN (
+                SELECT user_id, UPPER(symbol) FROM investments
+                GROUP BY user_id, UPPER(symbol) HAVING COUNT(*) > 1
+            )
+        ), folded AS (
+            SELECT keeper_id,
+                   SUM(units) AS units,
+                   SUM(cost_basis) AS cost_basis,
+                   SUM(current_value) AS current_value
+            FROM variants
+            WHERE id <> keeper_id
+            GROUP BY keeper_id
+        ), merged AS (
+            UPDATE investments k
+            SET units = k.units + f.units,
+                cost_basis = k.cost_basis + f.cost_basis,
+                avg_buy_price = CASE
+                    WHEN k.units + f.units > 0 THEN (k.cost_basis + f.cost_basis) / (k.units + f.units)
+                    ELSE 0
+                END,
+                current_value = COALESCE((k.units + f.units) * k.last_price, k.current_value + f.current_value)
+            FROM folded f
+            WHERE k.id = f.keeper_id
+            RETURNING k.id
+        )
+        DELETE FROM investments
+        WHERE id IN (SELECT id FROM variants WHERE id <> keeper_id);
+        """)
+        cur.execute("""
+        UPDATE investments SET symbol = UPPER(symbol) WHERE symbol <> UPPER(symbol);
+        """)
+        cur.execute("""
+        UPDATE transactions SET symbol = UPPER(symbol) WHERE symbol <> UPPER(symbol);
+        """)
+        cur.execute("""
+        ALTER TABLE investments DROP CONSTRAINT IF EXISTS investments_symbol_upper;
+        ALTER TABLE investments ADD CONSTRAINT investments_symbol_upper CHECK (symbol = UPPER(symbol));
+        ALTER TABLE transactions DROP CONSTRAINT IF EXISTS transactions_symbol_upper;
+        ALTER TABLE transactions ADD CONSTRAINT transactions_symbol_upper CHECK (symbol = UPPER(symbol));
+        """)
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS idx_investments_symbol
+    ON investments (symbol);
+    """)
+
+    # Symbol Price Checks table (when the price job last got a price per symbol,
+    # whether or not it changed; drives the incremental update's due test)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS symbol_price_checks (
+        symbol VARCHAR(20) PRIMARY KEY,
+        checked_at TIMESTAMP NOT NULL
+    );
+    """)
+
     # Add goal_id to investments if not exists
     cur.execute("""
     ALTER TABLE investments
@@ -15,7 +15,9 @@ from routes.profile import router as profile_router
 from routes.simulations import router as simulations_router
 from routes.dashboard import router as dashboard_router
 from routes.recommendations import router as recommendations_router
-from database import get_db_connection, init_db_pool, close_db_pool
+from services.price_stream import price_stream_hub
+from services.redis_pool import init_redis_pool, close_redis_pool
+from database import get_db_connection, init_db_pool, close_db_pool, init_async_db_pool, close_async_db_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -23,11 +25,17 @@ async def lifespan(app: FastAPI):
     # Startup
     print("📦 Starting application...")
     init_db_pool()
+    await init_async_db_pool()
+    init_redis_pool()
+    await price_stream_hub.start()
     # Celery worker handles background tasks now
     yield
     # Shutdown
     print("🛑 Shutting down application...")
+    await price_stream_hub.stop()
+    close_redis_pool()
     close_db_pool()
+    await close_async_db_pool()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -55,6 +63,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor, data version and timing headers read by the frontend
+    expose_headers=["X-Next-Cursor", "X-Data-Version", "Server-Timing"],
 )
 
 app.include_router(auth_router)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
-from database import get_db_connection
+from database import get_db_connection, get_async_db_connection, async_fetch_all
 from schema import GoalCreate, GoalResponse, GoalStatus
 from security import get_current_user
+from services.dashboard_service import bump_data_version
 from typing import List
 from datetime import datetime
 
@@ -9,28 +10,22 @@ router = APIRouter(prefix="/goals", tags=["goals"])
 
 
 @router.get("", response_model=List[dict])
-def get_goals(current_user: dict = Depends(get_current_user)):
+async def get_goals(current_user: dict = Depends(get_current_user)):
     """Get all goals for the current user"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT 
-            id,
-            goal_type,
-            target_amount,
-            target_date,
-            monthly_contribution,
-            status,
-            created_at
-        FROM goals
-        WHERE user_id = %s
-        ORDER BY created_at DESC
-    """, (current_user["id"],))
-    
-    goals = cur.fetchall()
-    cur.close()
-    conn.close()
+    async with get_async_db_connection() as conn:
+        goals = await async_fetch_all(conn, """
+            SELECT 
+                id,
+                goal_type,
+                target_amount,
+                target_date,
+                monthly_contribution,
+                status,
+                created_at
+            FROM goals
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+        """, (current_user["id"],))
     
     return goals
 
@@ -55,6 +50,7 @@ def create_goal(goal: GoalCreate, current_user: dict = Depends(get_current_user)
     ))
     
     new_goal = cur.fetchone()
+    bump_data_version(cur, current_user["id"], "goals")
     conn.commit()
     cur.close()
     conn.close()
@@ -95,6 +91,9 @@ def update_goal(goal_id: int, goal: GoalCreate, current_user: dict = Depends(get
     ))
     
     updated_goal = cur.fetchone()
+    # Precomputed progress reflects the old amounts; readers recompute until the next run
+    cur.execute("DELETE FROM goal_progress WHERE goal_id = %s", (goal_id,))
+    bump_data_version(cur, current_user["id"], "goals")
     conn.commit()
     cur.close()
     conn.close()
@@ -116,6 +115,7 @@ def delete_goal(goal_id: int, current_user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=404, detail="Goal not found")
     
     cur.execute("DELETE FROM goals WHERE id = %s AND user_id = %s", (goal_id, current_user["id"]))
+    bump_data_version(cur, current_user["id"], "goals")
     conn.commit()
     cur.close()
     conn.close()
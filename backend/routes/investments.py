@@ -1,66 +1,57 @@
-from fastapi import APIRouter, HTTPException, Depends, Header
-from database import get_db_connection
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from database import get_db_connection, get_async_db_connection, async_fetch_all
 from schema import InvestmentCreate
 from security import get_current_user
 from services.price_service import get_price_service, update_all_investment_prices
+from services.dashboard_service import bump_data_version
+from services.portfolio_summary import get_portfolio_summary_async, refresh_portfolio_summaries
+from services.price_history_service import build_price_history_query
+from services.price_stream import price_stream_hub, price_event, PRICE_STREAM_HEARTBEAT
+from services.scheduler import refresh_user_prices_task, refresh_job_id, refresh_job_owner
+from celery_app import celery_app
+from celery.result import AsyncResult
 # Scheduler endpoint removed (managed by Celery)
-from typing import List
+from typing import List, Optional
+from datetime import date, timedelta
 
 router = APIRouter(prefix="/investments", tags=["investments"])
 
 
 @router.get("", response_model=List[dict])
-def get_investments(current_user: dict = Depends(get_current_user)):
+async def get_investments(current_user: dict = Depends(get_current_user)):
     """Get all investments for the current user"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT 
-            id,
-            asset_type,
-            symbol,
-            units,
-            avg_buy_price,
-            cost_basis,
-            current_value,
-            last_price,
-            last_price_at
-        FROM investments
-        WHERE user_id = %s
-        ORDER BY symbol
-    """, (current_user["id"],))
-    
-    investments = cur.fetchall()
-    cur.close()
-    conn.close()
+    async with get_async_db_connection() as conn:
+        investments = await async_fetch_all(conn, """
+            SELECT 
+                id,
+                asset_type,
+                symbol,
+                units,
+                avg_buy_price,
+                cost_basis,
+                current_value,
+                last_price,
+                last_price_at
+            FROM investments
+            WHERE user_id = %s
+            ORDER BY symbol
+        """, (current_user["id"],))
     
     return investments
 
 
 @router.get("/summary")
-def get_investment_summary(current_user: dict = Depends(get_current_user)):
+async def get_investment_summary(current_user: dict = Depends(get_current_user)):
     """Get investment portfolio summary"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT 
-            COUNT(*) as total_investments,
-            COALESCE(SUM(cost_basis), 0) as total_cost_basis,
-            COALESCE(SUM(current_value), 0) as total_current_value,
-            COALESCE(SUM(current_value - cost_basis), 0) as total_gain_loss
-        FROM investments
-        WHERE user_id = %s
-    """, (current_user["id"],))
-    
-    summary = cur.fetchone()
-    cur.close()
-    conn.close()
+    async with get_async_db_connection() as conn:
+        summary = await get_portfolio_summary_async(conn, current_user["id"])
     
     # Calculate gain/loss percentage
-    total_cost_basis = float(summary["total_cost_basis"]) if summary["total_cost_basis"] else 0
-    total_gain_loss = float(summary["total_gain_loss"]) if summary["total_gain_loss"] else 0
+    total_cost_basis = summary["total_invested"]
+    total_gain_loss = summary["total_value"] - total_cost_basis
     
     gain_loss_percentage = 0
     if total_cost_basis > 0:
@@ -69,7 +60,7 @@ def get_investment_summary(current_user: dict = Depends(get_current_user)):
     return {
         "total_investments": summary["total_investments"],
         "total_cost_basis": total_cost_basis,
-        "total_current_value": float(summary["total_current_value"]) if summary["total_current_value"] else 0,
+        "total_current_value": summary["total_value"],
         "total_gain_loss": total_gain_loss,
         "total_gain_loss_percentage": round(gain_loss_percentage, 2)
     }
@@ -147,6 +138,8 @@ def update_investment(investment_id: int, investment: InvestmentCreate, current_
     ))
     
     updated_investment = cur.fetchone()
+    refresh_portfolio_summaries(cur, [current_user["id"]])
+    bump_data_version(cur, current_user["id"], "investments")
     conn.commit()
     cur.close()
     conn.close()
@@ -158,7 +151,7 @@ def update_investment(investment_id: int, investment: InvestmentCreate, current_
 
 @router.get("/price/{symbol}")
 def get_stock_price(symbol: str, current_user: dict = Depends(get_current_user)):
-    """Get current price for a stock symbol from yfinance (with Redis caching)"""
+    """Get current price for a stock symbol from the price provider (with Redis caching)"""
     price_service = get_price_service()
     price_data = price_service.fetch_price(symbol)
     
@@ -168,20 +161,109 @@ def get_stock_price(symbol: str, current_user: dict = Depends(get_current_user))
     return price_data
 
 
-@router.post("/refresh-prices")
+@router.get("/price-history/{symbol}")
+async def get_price_history(
+    symbol: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Daily OHLC bars of a symbol (default: the last year)."""
+    query, params = build_price_history_query(
+        symbol, start_date or date.today() - timedelta(days=365), end_date
+    )
+    async with get_async_db_connection() as conn:
+        return await async_fetch_all(conn, query, params)
+
+
+@router.get("/stream")
+async def stream_prices(request: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Live prices of the current user's holdings as Server-Sent Events.
+    Starts with a `price` event per symbol from the cache, then sends a `price`
+    event whenever one of them changes. Symbols bought after connecting are
+    picked up on reconnect.
+    """
+    async with get_async_db_connection() as conn:
+        rows = await async_fetch_all(
+            conn, "SELECT DISTINCT symbol FROM investments WHERE user_id = %s", (current_user["id"],)
+        )
+    symbols = [row["symbol"] for row in rows]
+    # Subscribe before reading the snapshot so no update falls in between
+    queue = price_stream_hub.subscribe(symbols)
+    snapshot = await run_in_threadpool(get_price_service().get_prices_from_cache, symbols) if symbols else {}
+
+    async def events():
+        try:
+            for price_data in snapshot.values():
+                yield price_event({
+                    key: value for key, value in price_data.items() if key not in ("fresh_until", "expires_at")
+                })
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), PRICE_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+        finally:
+            price_stream_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/price-stream/stats")
+def get_price_stream_stats(current_user: dict = Depends(get_current_user)):
+    """Clients, followed symbols and fan-out counters of this process's price stream."""
+    return price_stream_hub.stats()
+
+
+@router.get("/price-cache/stats")
+def get_price_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Hit / miss counters of this process's in-memory price cache."""
+    return get_price_service().get_cache_stats()
+
+
+@router.post("/refresh-prices", status_code=202)
 def refresh_all_prices(current_user: dict = Depends(get_current_user)):
     """
-    Manually trigger a price refresh for all investments.
-    Updates current_value and last_price for all investments in the database.
+    Queue a price refresh of the current user's investments.
+    Every one of their symbols is refetched (no freshness skip) by a Celery
+    worker; poll GET /investments/refresh-prices/{job_id} for progress.
     """
-    result = update_all_investment_prices()
+    job = refresh_user_prices_task.apply_async(
+        args=[current_user["id"]],
+        task_id=refresh_job_id(current_user["id"])
+    )
     return {
-        "message": "Price refresh completed",
-        "updated": result["updated"],
-        "failed": result["failed"]
+        "message": "Price refresh queued",
+        "job_id": job.id,
+        "status": "pending"
     }
 
 
+@router.get("/refresh-prices/{job_id}")
+def get_refresh_status(job_id: str, current_user: dict = Depends(get_current_user)):
+    """
+    Status of a price refresh job: pending, progress (with the current phase
+    and counts so far), success (with the update result) or failure.
+    """
+    if refresh_job_owner(job_id) != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Refresh job not found")
+    
+    job = AsyncResult(job_id, app=celery_app)
+    response = {"job_id": job_id, "status": job.state.lower()}
+    if job.state == "PROGRESS":
+        response["progress"] = job.info
+    elif job.state == "SUCCESS":
+        response["result"] = job.result
+    elif job.state == "FAILURE":
+        response["error"] = str(job.result)
+    return response
+
+
 
 @router.post("/trigger-update")
 def trigger_price_update(x_cron_secret: str = Header(None, alias="X-Cron-Secret")):
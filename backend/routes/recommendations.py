@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from database import get_db_connection
 from security import get_current_user
+from services.portfolio_summary import get_portfolio_summary
 from typing import Dict, List, Any
 from enum import Enum
 
@@ -55,19 +56,12 @@ def get_recommendations(current_user: dict = Depends(get_current_user)):
 
     # 3. Calculate Current Portfolio Allocation
     conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT asset_type, current_value 
-        FROM investments 
-        WHERE user_id = %s
-    """, (user_id,))
-    
-    investments = cur.fetchall()
-    cur.close()
-    conn.close()
+    try:
+        summary = get_portfolio_summary(conn, user_id)
+    finally:
+        conn.close()
 
-    total_portfolio_value = sum(float(inv["current_value"]) for inv in investments)
+    total_portfolio_value = summary["total_value"]
     
     current_allocation_value = {
         "equity": 0.0,
@@ -75,9 +69,7 @@ def get_recommendations(current_user: dict = Depends(get_current_user)):
         "cash": 0.0
     }
 
-    for inv in investments:
-        asset_type = inv["asset_type"]
-        value = float(inv["current_value"])
+    for asset_type, value in summary["allocation"].items():
         category = ASSET_CATEGORY_MAPPING.get(asset_type, "equity") # Default to equity if unknown
         if category in current_allocation_value:
             current_allocation_value[category] += value
@@ -1,58 +1,72 @@
-from fastapi import APIRouter, HTTPException, Depends
-from database import get_db_connection
-from schema import TransactionCreate
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from database import get_db_connection, get_async_db_connection, async_fetch_all, async_fetch_one
+from schema import TransactionCreate, TransactionType
 from security import get_current_user
-from typing import List
+from services.dashboard_service import bump_data_version
+from services.portfolio_summary import refresh_portfolio_summaries
+from services.transaction_service import build_transactions_page_query, paginate_rows, apply_transaction
+from services.transaction_import import TransactionImporter, ImportRejected
+from typing import List, Optional
+from datetime import date
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
 @router.get("", response_model=List[dict])
-def get_transactions(current_user: dict = Depends(get_current_user)):
-    """Get all transactions for the current user"""
-    conn = get_db_connection()
-    cur = conn.cursor()
+async def get_transactions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    type: Optional[TransactionType] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get transactions for the current user, newest first.
+    Pass `limit` to page through them: the cursor of the next page is returned
+    in the X-Next-Cursor header (absent on the last page).
+    Optional filters: symbol, type, start_date / end_date (inclusive).
+    """
+    try:
+        query, params = build_transactions_page_query(
+            current_user["id"],
+            limit=limit,
+            cursor=cursor,
+            symbol=symbol.upper() if symbol else None,
+            tx_type=type.value if type else None,
+            start_date=start_date,
+            end_date=end_date
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    cur.execute("""
-        SELECT 
-            id,
-            symbol,
-            type,
-            quantity,
-            price,
-            fees,
-            executed_at
-        FROM transactions
-        WHERE user_id = %s
-        ORDER BY executed_at DESC
-    """, (current_user["id"],))
+    async with get_async_db_connection() as conn:
+        rows = await async_fetch_all(conn, query, params)
+    transactions, next_cursor = paginate_rows(rows, limit)
     
-    transactions = cur.fetchall()
-    cur.close()
-    conn.close()
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
     return transactions
 
 
 @router.get("/summary")
-def get_transaction_summary(current_user: dict = Depends(get_current_user)):
+async def get_transaction_summary(current_user: dict = Depends(get_current_user)):
     """Get transaction summary statistics"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT 
-            COUNT(*) as total_transactions,
-            SUM(CASE WHEN type = 'buy' THEN quantity * price ELSE 0 END) as total_bought,
-            SUM(CASE WHEN type = 'sell' THEN quantity * price ELSE 0 END) as total_sold,
-            SUM(fees) as total_fees
-        FROM transactions
-        WHERE user_id = %s
-    """, (current_user["id"],))
-    
-    summary = cur.fetchone()
-    cur.close()
-    conn.close()
+    async with get_async_db_connection() as conn:
+        summary = await async_fetch_one(conn, """
+            SELECT 
+                COUNT(*) as total_transactions,
+                SUM(CASE WHEN type = 'buy' THEN quantity * price ELSE 0 END) as total_bought,
+                SUM(CASE WHEN type = 'sell' THEN quantity * price ELSE 0 END) as total_sold,
+                SUM(fees) as total_fees
+            FROM transactions
+            WHERE user_id = %s
+        """, (current_user["id"],))
     
     return summary
 
@@ -64,115 +78,26 @@ def create_transaction(transaction: TransactionCreate, current_user: dict = Depe
     
     Logic:
     - BUY: Increase units and cost basis (average cost). If new symbol, create investment.
-    - SELL: Decrease units and cost basis. If units reach 0, remove investment? (For now, keep with 0 units or delete).
+    - SELL: Decrease units and cost basis proportionally. The investment is removed when units reach 0;
+      selling more than is held is rejected.
+    Each trade is one INSERT ... ON CONFLICT / UPDATE statement (see apply_transaction),
+    so concurrent trades on the same symbol cannot lose updates.
     """
     conn = get_db_connection()
     cur = conn.cursor()
     
     try:
-        # 1. Record the Transaction
+        # 0. Advance the user's data version (stamped on the new row for delta sync)
+        data_version = bump_data_version(cur, current_user["id"], "transactions", "investments")
+        
+        # 1. Record the transaction and apply it to the position in one statement
         # NOTE: Cloud DB 'transactions' table does NOT have 'asset_type'. 
         # We accept it in the payload for Investment logic, but don't save it to transactions history.
-        cur.execute("""
-            INSERT INTO transactions 
-            (user_id, symbol, type, quantity, price, fees, executed_at)
-            VALUES (%s, %s, %s, %s, %s, %s, NOW())
-            RETURNING id, symbol, type, quantity, price, fees, executed_at
-        """, (
-            current_user["id"],
-            transaction.symbol,
-            transaction.type,
-            transaction.quantity,
-            transaction.price,
-            transaction.fees
-        ))
-        
-        new_transaction = cur.fetchone()
+        new_transaction = apply_transaction(cur, current_user["id"], transaction, data_version)
         
-        # 2. Update Investment Portfolio
-        # Check if investment exists
-        cur.execute("""
-            SELECT id, units, cost_basis, avg_buy_price FROM investments 
-            WHERE user_id = %s AND symbol = %s
-        """, (current_user["id"], transaction.symbol))
+        # 2. Keep the portfolio rollup in step with the holdings
+        refresh_portfolio_summaries(cur, [current_user["id"]])
         
-        existing_invest = cur.fetchone()
-        
-        total_cost = (transaction.quantity * transaction.price) + transaction.fees
-        
-        if transaction.type == 'buy':
-            if existing_invest:
-                new_units = float(existing_invest['units']) + transaction.quantity
-                new_cost_basis = float(existing_invest['cost_basis']) + total_cost
-                new_avg_price = new_cost_basis / new_units if new_units > 0 else 0
-                
-                cur.execute("""
-                    UPDATE investments 
-                    SET units = %s, cost_basis = %s, avg_buy_price = %s, current_value = %s, last_price = %s, last_price_at = NOW()
-                    WHERE id = %s
-                """, (
-                    new_units, 
-                    new_cost_basis, 
-                    new_avg_price, 
-                    new_units * transaction.price, # Approx current value based on last transaction price
-                    transaction.price,
-                    existing_invest['id']
-                ))
-            else:
-                # Create new investment
-                # We use the asset_type provided in the request payload
-                cur.execute("""
-                    INSERT INTO investments
-                    (user_id, asset_type, symbol, units, avg_buy_price, cost_basis, current_value, last_price, last_price_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                """, (
-                    current_user["id"],
-                    transaction.asset_type.value,
-                    transaction.symbol,
-                    transaction.quantity,
-                    transaction.price,      # avg_buy_price
-                    total_cost,             # cost_basis
-                    transaction.quantity * transaction.price,  # current_value
-                    transaction.price       # last_price
-                ))
-                
-        elif transaction.type == 'sell':
-            if not existing_invest:
-                raise HTTPException(status_code=400, detail=f"You don't own any {transaction.symbol} to sell")
-            
-            # Reduce units
-            current_units = float(existing_invest['units'])
-            
-            if current_units >= transaction.quantity:
-                new_units = current_units - transaction.quantity
-                
-                # Cost basis reduction (Proportional)
-                # Sold portion of cost basis = (Sold Qty / Total Qty) * Total Cost Basis
-                cost_basis_sold = (transaction.quantity / current_units) * float(existing_invest['cost_basis'])
-                new_cost_basis = float(existing_invest['cost_basis']) - cost_basis_sold
-                
-                cur.execute("""
-                    UPDATE investments 
-                    SET units = %s, cost_basis = %s, current_value = %s, last_price = %s, last_price_at = NOW()
-                    WHERE id = %s
-                """, (
-                    new_units, 
-                    new_cost_basis, 
-                    new_units * transaction.price, 
-                    transaction.price,
-                    existing_invest['id']
-                ))
-                
-                # Delete investment if units become 0
-                if new_units == 0:
-                    cur.execute("DELETE FROM investments WHERE id = %s", (existing_invest['id'],))
-            else:
-                # User selling more than they have? 
-                # Allow it but warn? Or block? 
-                # For simple app, allow negative units? Or throw error?
-                # Let's throw error for data integrity
-                raise HTTPException(status_code=400, detail="Insufficient units to sell")
-            
         conn.commit()
         cur.close()
         conn.close()
@@ -182,8 +107,55 @@ def create_transaction(transaction: TransactionCreate, current_user: dict = Depe
         response['asset_type'] = transaction.asset_type.value
         return response
         
+    except ValueError as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         conn.rollback()
         cur.close()
         conn.close()
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/import")
+async def import_transactions(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Bulk import historical transactions (e.g. a broker export).
+    
+    The body is CSV with a header row (symbol, type, quantity, price, fees,
+    asset_type, executed_at) or NDJSON with the same fields, one record per
+    line; the format follows `format` or else the Content-Type (text/csv).
+    Rows are validated as they stream in and nothing is written if any is
+    invalid (422) or sells more than is held (400). Otherwise the response is
+    an NDJSON stream of progress frames ending in {"status": "done", ...}; the
+    whole import is committed in one transaction.
+    """
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    importer = TransactionImporter(current_user["id"], fmt)
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(importer.feed, chunk)
+        importer.finish()
+    except ImportRejected as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "errors": e.errors})
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        await run_in_threadpool(importer.plan, cur)
+    except Exception as e:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        if isinstance(e, ImportRejected):
+            raise HTTPException(status_code=400, detail={"message": str(e), "errors": e.errors})
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(importer.write(conn, cur), media_type="application/x-ndjson")
@@ -141,6 +141,12 @@ class InvestmentBase(BaseModel):
     current_value: float
     last_price: float
 
+    @field_validator('symbol')
+    @classmethod
+    def normalize_symbol(cls, v):
+        # Symbols are stored upper-cased (enforced by a CHECK constraint)
+        return v.strip().upper()
+
 
 class InvestmentCreate(InvestmentBase):
     """Create model - user_id comes from JWT token"""
@@ -165,12 +171,24 @@ class TransactionBase(BaseModel):
     price: float
     fees: float
 
+    @field_validator('symbol')
+    @classmethod
+    def normalize_symbol(cls, v):
+        # Symbols are stored upper-cased so price updates can join on the symbol index
+        return v.strip().upper()
+
 
 class TransactionCreate(TransactionBase):
     """Create model - user_id comes from JWT token"""
     asset_type: AssetType = Field(default=AssetType.stock, description="Asset type for new investments")
 
 
+class TransactionImport(TransactionCreate):
+    """One row of a bulk import - historical trades carry their own execution time"""
+    fees: float = 0
+    executed_at: Optional[datetime] = Field(default=None, description="Defaults to the time of the import")
+
+
 class TransactionResponse(TransactionBase):
     id: int
     user_id: int
@@ -351,6 +351,10 @@ def seed():
 
     try:
         print("🗑️  Clearing existing seed data (keeping users)...")
+        cur.execute("DELETE FROM dashboard_snapshots")
+        cur.execute("DELETE FROM user_data_versions")
+        cur.execute("DELETE FROM user_portfolio_summary")
+        cur.execute("DELETE FROM portfolio_history_rollups")
         cur.execute("DELETE FROM portfolio_history")
         cur.execute("DELETE FROM simulations")
         cur.execute("DELETE FROM recommendations")
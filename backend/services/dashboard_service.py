@@ -0,0 +1,597 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Dict, Any, Iterable, Iterator, Optional
+from database import get_db_connection, async_fetch_one, db_pool_headroom, DB_POOL_MAX
+from services.downsampling import downsample_history
+from services.history_service import load_history_rows
+from services.goal_progress import build_goals_progress, GOAL_PROGRESS_COLUMNS
+from services.transaction_service import load_transactions_page, AGGREGATE_TRANSACTIONS_PAGE
+
+
+# Sections of the aggregate that carry their own data version
+DATA_SECTIONS = ("goals", "investments", "transactions", "history")
+
+
+# ==================== ROW FORMATTERS ====================
+
+def format_transaction(row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "symbol": row["symbol"],
+        "type": row["type"],
+        "quantity": float(row["quantity"]),
+        "price": float(row["price"]),
+        "fees": float(row["fees"]),
+        "executed_at": row["executed_at"]
+    }
+
+
+def format_history_row(row) -> Dict[str, Any]:
+    return {
+        "date": row["date"].strftime("%Y-%m-%d"),
+        "total_value": float(row["total_value"]),
+        "total_invested": float(row["total_invested"])
+    }
+
+
+# ==================== SECTION BUILDERS ====================
+
+def load_goals_section(cur, user_id: int, now: datetime) -> Dict[str, Any]:
+    """Load the user's goals with the progress of the active ones (precomputed when current)."""
+    cur.execute(f"""
+        SELECT g.id, g.goal_type, g.target_amount, g.monthly_contribution, g.target_date, g.status, g.created_at,
+               {GOAL_PROGRESS_COLUMNS}
+        FROM goals g
+        LEFT JOIN goal_progress gp ON gp.goal_id = g.id
+        WHERE g.user_id = %s
+        ORDER BY g.created_at DESC
+    """, (user_id,))
+    goals_raw = cur.fetchall()
+
+    goals = [
+        {
+            "id": row["id"],
+            "goal_type": row["goal_type"],
+            "target_amount": float(row["target_amount"]),
+            "target_date": row["target_date"],
+            "monthly_contribution": float(row["monthly_contribution"]),
+            "status": row["status"],
+            "created_at": row["created_at"]
+        }
+        for row in goals_raw
+    ]
+    goals_progress = build_goals_progress([row for row in goals_raw if row["status"] == 'active'], now)
+
+    return {"goals": goals, "goals_progress": goals_progress}
+
+
+def load_investments_section(cur, user_id: int) -> Dict[str, Any]:
+    """Load the user's holdings with the investment summary and allocation."""
+    cur.execute("""
+        SELECT id, asset_type, symbol, units, avg_buy_price, cost_basis, current_value, last_price, last_price_at
+        FROM investments
+        WHERE user_id = %s
+        ORDER BY symbol
+    """, (user_id,))
+    investments_raw = cur.fetchall()
+
+    investments = []
+    total_cost_basis = 0
+    total_current_value = 0
+    allocation_dict = {}
+
+    for row in investments_raw:
+        cb = float(row["cost_basis"]) if row["cost_basis"] else 0
+        cv = float(row["current_value"]) if row["current_value"] else 0
+        asset_type = row["asset_type"]
+
+        total_cost_basis += cb
+        total_current_value += cv
+
+        if asset_type in allocation_dict:
+            allocation_dict[asset_type] += cv
+        else:
+            allocation_dict[asset_type] = cv
+
+        investments.append({
+            "id": row["id"],
+            "asset_type": asset_type,
+            "symbol": row["symbol"],
+            "units": float(row["units"]),
+            "avg_buy_price": float(row["avg_buy_price"]),
+            "cost_basis": cb,
+            "current_value": cv,
+            "last_price": float(row["last_price"]),
+            "last_price_at": row["last_price_at"]
+        })
+
+    # Investment Summary
+    total_gain_loss = total_current_value - total_cost_basis
+    gain_loss_percentage = (total_gain_loss / total_cost_basis * 100) if total_cost_basis > 0 else 0
+
+    investment_summary = {
+        "total_investments": len(investments),
+        "total_cost_basis": total_cost_basis,
+        "total_current_value": total_current_value,
+        "total_gain_loss": total_gain_loss,
+        "total_gain_loss_percentage": round(gain_loss_percentage, 2)
+    }
+
+    # Allocation
+    allocation = [
+        {
+            "name": atype.replace('_', ' ').title(),
+            "value": val,
+            "percent": (val / total_current_value * 100) if total_current_value > 0 else 0
+        }
+        for atype, val in allocation_dict.items()
+    ]
+
+    # Dashboard Summary (Invested vs Current)
+    dashboard_summary = {
+        "invested": total_cost_basis,
+        "current": total_current_value
+    }
+
+    return {
+        "investments": investments,
+        "investment_summary": investment_summary,
+        "allocation": allocation,
+        "dashboard_summary": dashboard_summary
+    }
+
+
+def load_transactions_section(cur, user_id: int) -> Dict[str, Any]:
+    """
+    Load the first page of the user's transactions with the transaction summary.
+    The rest is fetched through GET /transactions with transactions_next_cursor.
+    """
+    rows, next_cursor = load_transactions_page(cur, user_id, limit=AGGREGATE_TRANSACTIONS_PAGE)
+
+    return {
+        "transactions": [format_transaction(row) for row in rows],
+        "transactions_next_cursor": next_cursor,
+        "transaction_summary": load_transaction_summary(cur, user_id)
+    }
+
+
+def load_history_section(cur, user_id: int) -> Dict[str, Any]:
+    """Load the full portfolio history (dailies, with monthly rollups past retention)."""
+    rows = load_history_rows(cur, user_id, date.min, "daily")
+    return {"history": [format_history_row(row) for row in rows]}
+
+
+# Independent aggregate sections; each one can run on its own connection
+AGGREGATE_SECTIONS = {
+    "goals": lambda cur, user_id, now: load_goals_section(cur, user_id, now),
+    "investments": lambda cur, user_id, now: load_investments_section(cur, user_id),
+    "transactions": lambda cur, user_id, now: load_transactions_section(cur, user_id),
+    "history": lambda cur, user_id, now: load_history_section(cur, user_id),
+}
+
+# Bounds the extra pooled connections the concurrent mode can hold at once
+# (across all rebuilds), leaving the rest of the sync pool to regular requests
+DASHBOARD_QUERY_WORKERS = int(os.getenv("DASHBOARD_QUERY_WORKERS", max(1, min(8, DB_POOL_MAX // 2))))
+_section_executor = ThreadPoolExecutor(max_workers=DASHBOARD_QUERY_WORKERS, thread_name_prefix="dashboard")
+_section_slots = threading.BoundedSemaphore(DASHBOARD_QUERY_WORKERS)
+_section_slots_lock = threading.Lock()
+
+
+def _reserve_section_connections(count: int) -> bool:
+    """
+    Take `count` section connection slots without waiting, all or nothing, and
+    only while the pool has that many connections to spare besides.
+    """
+    with _section_slots_lock:
+        if db_pool_headroom() < count:
+            return False
+        taken = 0
+        while taken < count and _section_slots.acquire(blocking=False):
+            taken += 1
+        if taken < count:
+            for _ in range(taken):
+                _section_slots.release()
+            return False
+        return True
+
+
+def _release_section_connections(count: int):
+    for _ in range(count):
+        _section_slots.release()
+
+
+def _assemble_aggregate(sections: Dict[str, Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+    """Merge the section results into the aggregate payload."""
+    dashboard_summary = sections["investments"]["dashboard_summary"]
+    history = sections["history"]["history"]
+
+    # If no history, use the current totals as a single point (today)
+    if not history and (dashboard_summary["current"] > 0 or dashboard_summary["invested"] > 0):
+        history = [{
+            "date": now.strftime("%Y-%m-%d"),
+            "total_value": dashboard_summary["current"],
+            "total_invested": dashboard_summary["invested"]
+        }]
+
+    return {
+        "goals": sections["goals"]["goals"],
+        "investments": sections["investments"]["investments"],
+        "investment_summary": sections["investments"]["investment_summary"],
+        "transactions": sections["transactions"]["transactions"],
+        "transactions_next_cursor": sections["transactions"]["transactions_next_cursor"],
+        "transaction_summary": sections["transactions"]["transaction_summary"],
+        "history": history,
+        "allocation": sections["investments"]["allocation"],
+        "dashboard_summary": dashboard_summary,
+        "goals_progress": sections["goals"]["goals_progress"]
+    }
+
+
+def build_dashboard_aggregate(cur, user_id: int, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Run every dashboard query for a user one after another on a single cursor.
+    If `timings` is given, it is filled with the elapsed milliseconds per section.
+    """
+    now = datetime.now()
+    sections = {}
+    for name, loader in AGGREGATE_SECTIONS.items():
+        start = time.perf_counter()
+        sections[name] = loader(cur, user_id, now)
+        if timings is not None:
+            timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    return _assemble_aggregate(sections, now)
+
+
+def _run_section(name: str, user_id: int, now: datetime):
+    """Run one aggregate section on its own pooled connection."""
+    start = time.perf_counter()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        result = AGGREGATE_SECTIONS[name](cur, user_id, now)
+    finally:
+        cur.close()
+        conn.close()
+    return result, round((time.perf_counter() - start) * 1000, 2)
+
+
+def build_dashboard_aggregate_concurrent(user_id: int, timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Run the independent dashboard queries concurrently, one pooled connection each,
+    so latency approaches the slowest section instead of the sum of all four.
+    If `timings` is given, it is filled with the elapsed milliseconds per section.
+    """
+    now = datetime.now()
+    futures = {
+        name: _section_executor.submit(_run_section, name, user_id, now)
+        for name in AGGREGATE_SECTIONS
+    }
+    sections = {}
+    for name, future in futures.items():
+        sections[name], elapsed = future.result()
+        if timings is not None:
+            timings[name] = elapsed
+    return _assemble_aggregate(sections, now)
+
+
+def load_transaction_summary(cur, user_id: int) -> Dict[str, Any]:
+    """Compute the transaction summary in SQL without fetching the rows."""
+    cur.execute("""
+        SELECT 
+            COUNT(*) as total_transactions,
+            COALESCE(SUM(CASE WHEN type = 'buy' THEN quantity * price ELSE 0 END), 0) as total_bought,
+            COALESCE(SUM(CASE WHEN type = 'sell' THEN quantity * price ELSE 0 END), 0) as total_sold,
+            COALESCE(SUM(fees), 0) as total_fees
+        FROM transactions
+        WHERE user_id = %s
+    """, (user_id,))
+    row = cur.fetchone()
+    return {
+        "total_transactions": row["total_transactions"],
+        "total_bought": float(row["total_bought"]),
+        "total_sold": float(row["total_sold"]),
+        "total_fees": float(row["total_fees"])
+    }
+
+
+# ==================== DATA VERSIONS ====================
+
+def bump_data_versions(cur, user_ids: Iterable[int], *sections: str) -> Dict[int, int]:
+    """
+    Advance the data version of several users and stamp the changed sections.
+    Call this on the write's own cursor so the bump commits (or rolls back) with it.
+    Any stored dashboard snapshot built at an older version stops being served.
+
+    Returns:
+        Dict mapping user_id -> new version
+    """
+    for section in sections:
+        if section not in DATA_SECTIONS:
+            raise ValueError(f"Unknown data section: {section}")
+
+    # Sorted so concurrent bulk bumps lock rows in the same order
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return {}
+
+    columns = [f"{section}_version" for section in sections]
+    insert_columns = ", ".join(["user_id", "version"] + columns)
+    insert_values = ", ".join(["uid", "1"] + ["1"] * len(columns))
+    updates = ", ".join(
+        ["version = user_data_versions.version + 1"]
+        + [f"{column} = user_data_versions.version + 1" for column in columns]
+    )
+
+    cur.execute(f"""
+        INSERT INTO user_data_versions ({insert_columns}, updated_at)
+        SELECT {insert_values}, NOW() FROM UNNEST(%s::int[]) AS uid
+        ON CONFLICT (user_id)
+        DO UPDATE SET {updates}, updated_at = NOW()
+        RETURNING user_id, version
+    """, (user_ids,))
+
+    return {row["user_id"]: row["version"] for row in cur.fetchall()}
+
+
+def bump_data_version(cur, user_id: int, *sections: str) -> int:
+    """Advance a single user's data version. Returns the new version."""
+    return bump_data_versions(cur, [user_id], *sections)[user_id]
+
+
+def get_data_versions(cur, user_id: int) -> Dict[str, int]:
+    """Get the user's overall and per-section data versions (all 0 if never written)."""
+    cur.execute("""
+        SELECT version, goals_version, investments_version, transactions_version, history_version
+        FROM user_data_versions
+        WHERE user_id = %s
+    """, (user_id,))
+    row = cur.fetchone()
+    if not row:
+        return {"version": 0, **{section: 0 for section in DATA_SECTIONS}}
+    return {
+        "version": row["version"],
+        **{section: row[f"{section}_version"] for section in DATA_SECTIONS}
+    }
+
+
+def build_dashboard_delta(cur, user_id: int, since: int, versions: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Build the part of the aggregate that changed after version `since`.
+
+    Goals and investments sections are sent whole when they changed.
+    Transactions and history only carry the rows written after `since`;
+    clients merge them by id / date. Summaries are always recomputed for
+    the sections that are present.
+    """
+    now = datetime.now()
+    delta = {"version": versions["version"], "since": since, "delta": True}
+
+    if versions["goals"] > since:
+        delta.update(load_goals_section(cur, user_id, now))
+
+    if versions["investments"] > since:
+        delta.update(load_investments_section(cur, user_id))
+
+    if versions["transactions"] > since:
+        cur.execute("""
+            SELECT id, symbol, type, quantity, price, fees, executed_at
+            FROM transactions
+            WHERE user_id = %s AND data_version > %s
+            ORDER BY executed_at DESC, id DESC
+        """, (user_id, since))
+        delta["transactions"] = [format_transaction(row) for row in cur.fetchall()]
+        delta["transaction_summary"] = load_transaction_summary(cur, user_id)
+
+    if versions["history"] > since:
+        cur.execute("""
+            SELECT date, total_value, total_invested
+            FROM portfolio_history
+            WHERE user_id = %s AND data_version > %s
+            ORDER BY date ASC
+        """, (user_id, since))
+        delta["history"] = [format_history_row(row) for row in cur.fetchall()]
+
+    return delta
+
+
+# ==================== MATERIALIZED SNAPSHOTS ====================
+
+def _json_default(value):
+    """Serialize dates the same way FastAPI does (ISO 8601)."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# The user's current data version alongside the stored snapshot. Goal progress
+# and the fallback history point depend on the date, so a snapshot built on an
+# earlier day is stale even if no data changed.
+SNAPSHOT_QUERY = """
+    SELECT COALESCE(v.version, 0) AS version, s.payload, s.data_version,
+           COALESCE(s.built_at >= CURRENT_DATE, FALSE) AS built_today
+    FROM (SELECT %s::int AS user_id) u
+    LEFT JOIN user_data_versions v ON v.user_id = u.user_id
+    LEFT JOIN dashboard_snapshots s ON s.user_id = u.user_id
+"""
+
+
+def get_dashboard_snapshot(
+    user_id: int,
+    concurrent: bool = False,
+    timings: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Serve the user's precomputed dashboard aggregate.
+    A snapshot is only served while it was built today at the user's current
+    data version; otherwise the aggregate is rebuilt from the source tables and
+    stored so the next request is a single primary-key lookup.
+    With `concurrent`, the sections are rebuilt on parallel connections while
+    DASHBOARD_QUERY_WORKERS section connections are free (this request's own
+    connection goes back to the pool meanwhile), else sequentially on one
+    connection, so rebuilds cannot exhaust the connection pool.
+    If `timings` is given, it is filled with the elapsed milliseconds per step.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        start = time.perf_counter()
+        cur.execute(SNAPSHOT_QUERY, (user_id,))
+        row = cur.fetchone()
+        if timings is not None:
+            timings["snapshot"] = round((time.perf_counter() - start) * 1000, 2)
+        version = row["version"]
+        if row["payload"] is not None and row["data_version"] == version and row["built_today"]:
+            return {**row["payload"], "version": version}
+
+        # Version is read before the data, so a write that lands mid-build
+        # bumps past it and the stored snapshot is never served stale.
+        start = time.perf_counter()
+        sections = len(AGGREGATE_SECTIONS)
+        if concurrent and _reserve_section_connections(sections):
+            # Back to the pool while the sections run on their own connections
+            conn.commit()
+            cur.close()
+            conn.close()
+            conn = None
+            try:
+                aggregate = build_dashboard_aggregate_concurrent(user_id, timings)
+            finally:
+                _release_section_connections(sections)
+            conn = get_db_connection()
+            cur = conn.cursor()
+        else:
+            aggregate = build_dashboard_aggregate(cur, user_id, timings)
+        if timings is not None:
+            timings["rebuild"] = round((time.perf_counter() - start) * 1000, 2)
+
+        payload = json.loads(json.dumps(aggregate, default=_json_default))
+        cur.execute("""
+            INSERT INTO dashboard_snapshots (user_id, payload, data_version, built_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (user_id)
+            DO UPDATE SET payload = EXCLUDED.payload, data_version = EXCLUDED.data_version, built_at = NOW()
+        """, (user_id, json.dumps(payload), version))
+        conn.commit()
+        return {**payload, "version": version}
+    except Exception:
+        if conn is not None:
+            conn.rollback()
+        raise
+    finally:
+        if conn is not None:
+            cur.close()
+            conn.close()
+
+
+async def fetch_dashboard_snapshot_async(
+    conn,
+    user_id: int,
+    timings: Optional[Dict[str, float]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    asyncpg read of the user's snapshot (conn from get_async_db_connection).
+    Returns None when the snapshot is missing or stale; the caller then falls
+    back to get_dashboard_snapshot to rebuild it.
+    """
+    start = time.perf_counter()
+    row = await async_fetch_one(conn, SNAPSHOT_QUERY, (user_id,))
+    if timings is not None:
+        timings["snapshot"] = round((time.perf_counter() - start) * 1000, 2)
+    if row["payload"] is None or row["data_version"] != row["version"] or not row["built_today"]:
+        return None
+    return {**row["payload"], "version": row["version"]}
+
+
+# ==================== STREAMING ====================
+
+# Rows per transactions frame / server-side cursor fetch
+STREAM_TRANSACTIONS_CHUNK = 500
+
+
+def _ndjson_frame(section: str, data: Any) -> bytes:
+    return (json.dumps({"section": section, "data": data}, default=_json_default) + "\n").encode("utf-8")
+
+
+def stream_dashboard_aggregate(user_id: int, max_points: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Yield the dashboard aggregate as NDJSON frames, one per section, as soon as
+    each is ready: summary, allocation, investments, goals, goals_progress, history,
+    then transactions in chunks read through a server-side cursor, and finally
+    transaction_summary (accumulated while streaming) and an end marker.
+    Only one transactions chunk is held in memory at a time.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        now = datetime.now()
+        versions = get_data_versions(cur, user_id)
+
+        investments_section = load_investments_section(cur, user_id)
+        dashboard_summary = investments_section["dashboard_summary"]
+        yield _ndjson_frame("summary", {
+            "version": versions["version"],
+            "dashboard_summary": dashboard_summary,
+            "investment_summary": investments_section["investment_summary"]
+        })
+        yield _ndjson_frame("allocation", investments_section["allocation"])
+        yield _ndjson_frame("investments", investments_section["investments"])
+
+        goals_section = load_goals_section(cur, user_id, now)
+        yield _ndjson_frame("goals", goals_section["goals"])
+        yield _ndjson_frame("goals_progress", goals_section["goals_progress"])
+
+        history = load_history_section(cur, user_id)["history"]
+        if not history and (dashboard_summary["current"] > 0 or dashboard_summary["invested"] > 0):
+            history = [{
+                "date": now.strftime("%Y-%m-%d"),
+                "total_value": dashboard_summary["current"],
+                "total_invested": dashboard_summary["invested"]
+            }]
+        yield _ndjson_frame("history", downsample_history(history, max_points))
+
+        # Server-side cursor: rows are pulled from Postgres chunk by chunk
+        tx_cur = conn.cursor(name=f"dashboard_stream_{user_id}")
+        tx_cur.itersize = STREAM_TRANSACTIONS_CHUNK
+        try:
+            tx_cur.execute("""
+                SELECT id, symbol, type, quantity, price, fees, executed_at
+                FROM transactions
+                WHERE user_id = %s
+                ORDER BY executed_at DESC, id DESC
+            """, (user_id,))
+
+            transaction_summary = {
+                "total_transactions": 0,
+                "total_bought": 0,
+                "total_sold": 0,
+                "total_fees": 0
+            }
+            while True:
+                rows = tx_cur.fetchmany(STREAM_TRANSACTIONS_CHUNK)
+                if not rows:
+                    break
+                chunk = [format_transaction(row) for row in rows]
+                for tx in chunk:
+                    if tx["type"] == 'buy':
+                        transaction_summary["total_bought"] += tx["quantity"] * tx["price"]
+                    elif tx["type"] == 'sell':
+                        transaction_summary["total_sold"] += tx["quantity"] * tx["price"]
+                    transaction_summary["total_fees"] += tx["fees"]
+                transaction_summary["total_transactions"] += len(chunk)
+                yield _ndjson_frame("transactions", chunk)
+        finally:
+            tx_cur.close()
+
+        yield _ndjson_frame("transaction_summary", transaction_summary)
+        yield _ndjson_frame("end", {"version": versions["version"]})
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
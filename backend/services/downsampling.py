@@ -0,0 +1,64 @@
+import numpy as np
+from typing import List, Dict, Any
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+    Returns the indices of the points to keep (always including the first and last).
+
+    The series is split into n_out - 2 buckets. For each bucket the point that forms
+    the largest triangle with the previously kept point and the average of the next
+    bucket is kept, so peaks and troughs survive. Triangle areas are computed for the
+    whole bucket at once with NumPy.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+
+    # Bucket boundaries over the interior points [1, n - 1)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts = edges[:-1]
+    ends = np.maximum(edges[1:], starts + 1)
+
+    # Average of every bucket, used as the third triangle vertex of the previous bucket
+    sizes = ends - starts
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / sizes
+    avg_y = np.add.reduceat(y[1:n - 1], starts - 1) / sizes
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = starts[i], ends[i]
+        # Twice the triangle area (constant factor does not change the argmax)
+        areas = np.abs(
+            (x[a] - next_x[i]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[i] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_history(history: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """
+    Reduce a portfolio history series to at most max_points rows.
+    Points are picked with LTTB on total_value, so the chart keeps its shape;
+    total_invested is carried along at the same dates.
+    """
+    if not max_points or len(history) <= max_points:
+        return history
+
+    x = np.array([row["date"] for row in history], dtype="datetime64[D]").astype(np.int64)
+    y = np.array([row["total_value"] for row in history], dtype=np.float64)
+
+    return [history[i] for i in lttb_indices(x, y, max_points)]
@@ -0,0 +1,178 @@
+import numpy as np
+from datetime import datetime
+from typing import List, Dict, Any, Sequence
+
+# Goals fetched / written per round-trip by the nightly precompute job
+GOAL_PROGRESS_BATCH_SIZE = 5000
+
+
+def _year_month(values: Sequence, fallback: datetime) -> np.ndarray:
+    """Months since year 0 for each date / datetime (missing values use fallback)."""
+    return np.fromiter(
+        ((v or fallback).year * 12 + (v or fallback).month for v in values),
+        dtype=np.int64,
+        count=len(values)
+    )
+
+
+def compute_goal_progress(goals: Sequence[Dict[str, Any]], now: datetime) -> Dict[str, np.ndarray]:
+    """
+    Compute progress for a whole batch of goals at once.
+    The batch can be one user's goals or every active goal in the system.
+
+    Savings are estimated as monthly contribution × months elapsed since the
+    goal was created (at least one month), capped at the target amount.
+
+    Returns:
+        Dict of arrays aligned with `goals`: months_elapsed, current_saved,
+        percent, months_remaining
+    """
+    target = np.array([float(g["target_amount"]) for g in goals], dtype=np.float64)
+    monthly = np.array([float(g["monthly_contribution"] or 0) for g in goals], dtype=np.float64)
+    now_ym = now.year * 12 + now.month
+
+    created_ym = _year_month([g["created_at"] for g in goals], now)
+    months_elapsed = np.maximum(1, now_ym - created_ym)
+
+    current_saved = np.minimum(monthly * months_elapsed, target)
+    percent = np.divide(current_saved * 100, target, out=np.zeros_like(target), where=target > 0)
+
+    # Goals without a target date fall back to `now`, i.e. 0 months remaining
+    target_ym = _year_month([g["target_date"] for g in goals], now)
+    months_remaining = np.maximum(0, target_ym - now_ym)
+
+    return {
+        "months_elapsed": months_elapsed,
+        "current_saved": np.round(current_saved, 2),
+        "percent": np.round(np.minimum(percent, 100), 1),
+        "months_remaining": months_remaining,
+    }
+
+
+# goal_progress columns the readers join onto their goal rows:
+# LEFT JOIN goal_progress gp ON gp.goal_id = g.id
+GOAL_PROGRESS_COLUMNS = "gp.current_saved, gp.percent, gp.months_remaining, gp.computed_at"
+
+
+def _is_current(goal: Dict[str, Any], now: datetime) -> bool:
+    """Whether the goal's precomputed progress (if joined) is from this month."""
+    computed_at = goal.get("computed_at")
+    return computed_at is not None and (computed_at.year, computed_at.month) == (now.year, now.month)
+
+
+def build_goals_progress(goals: Sequence[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Format the progress of a batch of goal rows for the dashboard endpoints.
+    Rows carrying goal_progress computed this month (GOAL_PROGRESS_COLUMNS) use
+    it as is; the rest (new or edited goals, missed nightly run) are computed here.
+    """
+    if not goals:
+        return []
+
+    current_saved, percent, months_remaining, stale = [], [], [], []
+    for i, goal in enumerate(goals):
+        if _is_current(goal, now):
+            current_saved.append(float(goal["current_saved"]))
+            percent.append(float(goal["percent"]))
+            months_remaining.append(goal["months_remaining"])
+        else:
+            current_saved.append(0.0)
+            percent.append(0.0)
+            months_remaining.append(0)
+            stale.append(i)
+
+    if stale:
+        progress = compute_goal_progress([goals[i] for i in stale], now)
+        for j, i in enumerate(stale):
+            current_saved[i] = progress["current_saved"][j].item()
+            percent[i] = progress["percent"][j].item()
+            months_remaining[i] = progress["months_remaining"][j].item()
+
+    return [
+        {
+            "id": goal["id"],
+            "name": goal["goal_type"].replace('_', ' ').title(),
+            "target": float(goal["target_amount"]),
+            "current": current_saved[i],
+            "percent": percent[i],
+            "monthly_contribution": float(goal["monthly_contribution"]) if goal["monthly_contribution"] else 0,
+            "target_date": str(goal["target_date"]) if goal["target_date"] else None,
+            "months_remaining": months_remaining[i],
+            "status": goal["status"]
+        }
+        for i, goal in enumerate(goals)
+    ]
+
+
+def precompute_all_goal_progress():
+    """
+    Nightly job: compute progress for every active goal in the system and store it
+    in the goal_progress table. Goals are streamed through a server-side cursor and
+    processed in batches of GOAL_PROGRESS_BATCH_SIZE.
+    """
+    from database import get_db_connection
+    from psycopg2.extras import execute_values
+
+    now = datetime.now()
+    conn = get_db_connection()
+    read_cur = conn.cursor(name="goal_progress_precompute")
+    read_cur.itersize = GOAL_PROGRESS_BATCH_SIZE
+    write_cur = conn.cursor()
+    total = 0
+
+    try:
+        read_cur.execute("""
+            SELECT id, user_id, target_amount, monthly_contribution, target_date, created_at
+            FROM goals
+            WHERE status = 'active'
+        """)
+
+        while True:
+            goals = read_cur.fetchmany(GOAL_PROGRESS_BATCH_SIZE)
+            if not goals:
+                break
+
+            progress = compute_goal_progress(goals, now)
+            execute_values(write_cur, """
+                INSERT INTO goal_progress
+                (goal_id, user_id, months_elapsed, current_saved, percent, months_remaining, computed_at)
+                VALUES %s
+                ON CONFLICT (goal_id)
+                DO UPDATE SET
+                    months_elapsed = EXCLUDED.months_elapsed,
+                    current_saved = EXCLUDED.current_saved,
+                    percent = EXCLUDED.percent,
+                    months_remaining = EXCLUDED.months_remaining,
+                    computed_at = EXCLUDED.computed_at
+            """, list(zip(
+                [g["id"] for g in goals],
+                [g["user_id"] for g in goals],
+                progress["months_elapsed"].tolist(),
+                progress["current_saved"].tolist(),
+                progress["percent"].tolist(),
+                progress["months_remaining"].tolist(),
+                [now] * len(goals)
+            )), page_size=1000)
+            total += len(goals)
+
+        # A named cursor must be closed before its transaction ends
+        read_cur.close()
+
+        # Goals that are no longer active keep no precomputed progress
+        write_cur.execute("""
+            DELETE FROM goal_progress gp
+            USING goals g
+            WHERE g.id = gp.goal_id AND g.status <> 'active'
+        """)
+
+        conn.commit()
+        print(f"🎯 Precomputed progress for {total} active goals")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error precomputing goal progress: {e}")
+        raise
+    finally:
+        write_cur.close()
+        conn.close()
+
+    return {"goals": total}
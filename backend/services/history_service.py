@@ -0,0 +1,174 @@
+import os
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Tuple
+
+# Rollup tiers of portfolio_history, finest first (daily is the raw table)
+HISTORY_TIERS = ("daily", "weekly", "monthly")
+
+# Coarsest tier that still draws a smooth chart for each period
+PERIOD_TIERS = {
+    "1M": "daily",
+    "3M": "daily",
+    "6M": "weekly",
+    "1Y": "weekly",
+    "ALL": "monthly",
+}
+
+# Raw daily rows older than this are dropped once rolled up (0 keeps them forever)
+HISTORY_DAILY_RETENTION_DAYS = int(os.getenv("HISTORY_DAILY_RETENTION_DAYS", 730))
+
+
+def select_history_tier(period: str) -> str:
+    """Pick the coarsest rollup tier that satisfies the requested chart period."""
+    return PERIOD_TIERS.get(period, "daily")
+
+
+def build_history_query(user_id: int, start_date, tier: str = "daily") -> Tuple[str, Dict[str, Any]]:
+    """
+    Build the portfolio history query (date, total_value, total_invested) from start_date on.
+
+    - daily: raw rows, prefixed with monthly rollups for the range whose dailies
+      were already dropped by the retention policy.
+    - weekly / monthly: rollup rows, followed by any raw rows newer than the last
+      compaction so the latest point is always present.
+
+    Returns:
+        (query, params) with psycopg2 placeholders
+    """
+    if tier not in HISTORY_TIERS:
+        raise ValueError(f"Unknown history tier: {tier}")
+
+    if tier == "daily":
+        query = """
+            WITH earliest AS (
+                SELECT MIN(date) AS first_date FROM portfolio_history WHERE user_id = %(user_id)s
+            )
+            SELECT r.date, r.total_value, r.total_invested
+            FROM portfolio_history_rollups r, earliest
+            WHERE r.user_id = %(user_id)s AND r.tier = 'monthly' AND r.date >= %(start_date)s
+              AND r.date < COALESCE(earliest.first_date, 'infinity'::date)
+            UNION ALL
+            SELECT date, total_value, total_invested
+            FROM portfolio_history
+            WHERE user_id = %(user_id)s AND date >= %(start_date)s
+            ORDER BY date ASC
+        """
+    else:
+        query = """
+            WITH latest AS (
+                SELECT MAX(date) AS last_date
+                FROM portfolio_history_rollups
+                WHERE user_id = %(user_id)s AND tier = %(tier)s
+            )
+            SELECT date, total_value, total_invested
+            FROM portfolio_history_rollups
+            WHERE user_id = %(user_id)s AND tier = %(tier)s AND date >= %(start_date)s
+            UNION ALL
+            SELECT h.date, h.total_value, h.total_invested
+            FROM portfolio_history h, latest
+            WHERE h.user_id = %(user_id)s AND h.date >= %(start_date)s
+              AND h.date > COALESCE(latest.last_date, '-infinity'::date)
+            ORDER BY date ASC
+        """
+
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    return query, {"user_id": user_id, "start_date": start_date, "tier": tier}
+
+
+def load_history_rows(cur, user_id: int, start_date, tier: str = "daily") -> List[Dict[str, Any]]:
+    """Load portfolio history rows from start_date on (see build_history_query)."""
+    query, params = build_history_query(user_id, start_date, tier)
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def compact_portfolio_history():
+    """
+    Roll daily portfolio_history rows up into the weekly and monthly tiers.
+    Each rollup row holds the value at the last recorded day of its period.
+    Only periods containing daily rows written since the previous compaction are
+    recomputed, then raw dailies past the retention age are dropped.
+    """
+    from database import get_db_connection
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    result = {"weekly": 0, "monthly": 0, "deleted": 0}
+
+    try:
+        # Earliest day touched since the last compaction (everything on the first run)
+        cur.execute("""
+            SELECT MIN(h.date) AS from_date
+            FROM portfolio_history h
+            WHERE h.created_at > COALESCE(
+                (SELECT MAX(updated_at) FROM portfolio_history_rollups), '-infinity'::timestamp
+            )
+        """)
+        from_date = cur.fetchone()["from_date"]
+
+        if from_date:
+            for tier, unit in (("weekly", "week"), ("monthly", "month")):
+                cur.execute(f"""
+                    INSERT INTO portfolio_history_rollups
+                    (user_id, tier, period_start, date, total_value, total_invested, updated_at)
+                    SELECT DISTINCT ON (user_id, date_trunc('{unit}', date))
+                        user_id,
+                        %(tier)s,
+                        date_trunc('{unit}', date)::date,
+                        date,
+                        total_value,
+                        total_invested,
+                        NOW()
+                    FROM portfolio_history
+                    WHERE date >= date_trunc('{unit}', %(from_date)s::date)
+                    ORDER BY user_id, date_trunc('{unit}', date), date DESC
+                    ON CONFLICT (user_id, tier, period_start)
+                    DO UPDATE SET
+                        date = EXCLUDED.date,
+                        total_value = EXCLUDED.total_value,
+                        total_invested = EXCLUDED.total_invested,
+                        updated_at = NOW()
+                """, {"tier": tier, "from_date": from_date})
+                result[tier] = cur.rowcount
+
+        if HISTORY_DAILY_RETENTION_DAYS > 0:
+            result["deleted"] = _drop_expired_dailies(cur, date.today() - timedelta(days=HISTORY_DAILY_RETENTION_DAYS))
+
+        conn.commit()
+        print(f"🗜️ Compacted portfolio history: {result}")
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error compacting portfolio history: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    return result
+
+
+def _drop_expired_dailies(cur, cutoff: date) -> int:
+    """
+    Delete raw daily rows of the whole months before cutoff's month whose week
+    and month are both rolled up (after the daily was written).
+    Rollups keep each period's closing value, so they stay valid once the dailies
+    are gone. Months are dropped whole because the daily tier of
+    build_history_query only fills in monthly rollups before the first daily.
+    """
+    cur.execute("""
+        DELETE FROM portfolio_history h
+        WHERE h.date < %s
+          AND EXISTS (
+              SELECT 1 FROM portfolio_history_rollups w
+              WHERE w.user_id = h.user_id AND w.tier = 'weekly'
+                AND w.period_start = date_trunc('week', h.date)::date
+          )
+          AND EXISTS (
+              SELECT 1 FROM portfolio_history_rollups m
+              WHERE m.user_id = h.user_id AND m.tier = 'monthly'
+                AND m.period_start = date_trunc('month', h.date)::date
+                AND m.updated_at >= h.created_at
+          )
+    """, (cutoff.replace(day=1),))
+    return cur.rowcount
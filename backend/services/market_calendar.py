@@ -0,0 +1,127 @@
+import os
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Dict, Set, Tuple
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Trading sessions of the exchanges our users hold symbols on.
+# Symbols are mapped to an exchange by their Yahoo suffix; anything else is US.
+EXCHANGES = {
+    "NSE": {"tz": ZoneInfo("Asia/Kolkata"), "open": time(9, 15), "close": time(15, 30), "suffixes": (".NS", ".BO")},
+    "US": {"tz": ZoneInfo("America/New_York"), "open": time(9, 30), "close": time(16, 0), "suffixes": ()},
+}
+
+# Full-day market holidays (weekends are always closed), from the calendars the
+# exchanges publish - NYSE a few years ahead, NSE each December for the next year.
+# Extra dates can be added with MARKET_HOLIDAYS="NSE:2026-03-03,US:2026-11-27".
+MARKET_HOLIDAYS: Dict[str, Set[date]] = {
+    "NSE": {date.fromisoformat(d) for d in (
+        "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+        "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+        "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+        "2026-01-15", "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31",
+        "2026-04-03", "2026-04-14", "2026-05-01", "2026-05-28", "2026-06-26",
+        "2026-09-14", "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24",
+        "2026-12-25",
+        # 2027 dates fixed by the Gregorian calendar; festivals follow NSE's circular
+        "2027-01-26", "2027-03-26", "2027-04-14",
+    )},
+    "US": {date.fromisoformat(d) for d in (
+        "2025-01-01", "2025-01-20", "2025-02-17", "2025-04-18", "2025-05-26",
+        "2025-06-19", "2025-07-04", "2025-09-01", "2025-11-27", "2025-12-25",
+        "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25",
+        "2026-06-19", "2026-07-03", "2026-09-07", "2026-11-26", "2026-12-25",
+        "2027-01-01", "2027-01-18", "2027-02-15", "2027-03-26", "2027-05-31",
+        "2027-06-18", "2027-07-05", "2027-09-06", "2027-11-25", "2027-12-24",
+    )},
+}
+# Last day each holiday calendar above is complete for
+MARKET_HOLIDAYS_THROUGH: Dict[str, date] = {
+    "NSE": date(2026, 12, 31),
+    "US": date(2027, 12, 31),
+}
+for _entry in filter(None, os.getenv("MARKET_HOLIDAYS", "").split(",")):
+    _exchange, _day = _entry.strip().split(":")
+    MARKET_HOLIDAYS.setdefault(_exchange.upper(), set()).add(date.fromisoformat(_day))
+
+# (exchange, year) pairs already warned about, so the warning is logged once
+_uncovered_years: Set[Tuple[str, int]] = set()
+
+# While a market is open, a price stays fresh this long (seconds)
+PRICE_TTL_MARKET_OPEN = int(os.getenv("PRICE_TTL_MARKET_OPEN", 900))
+# One last refresh this long after the close picks up the closing price
+PRICE_CLOSE_SETTLE = int(os.getenv("PRICE_CLOSE_SETTLE", 300))
+
+
+def exchange_for_symbol(symbol: str) -> str:
+    """Exchange whose calendar governs the symbol."""
+    symbol = symbol.upper()
+    for exchange, spec in EXCHANGES.items():
+        if spec["suffixes"] and symbol.endswith(spec["suffixes"]):
+            return exchange
+    return "US"
+
+
+def is_trading_day(exchange: str, day: date) -> bool:
+    """Weekday that is not a market holiday."""
+    through = MARKET_HOLIDAYS_THROUGH.get(exchange)
+    if through is not None and day > through and (exchange, day.year) not in _uncovered_years:
+        _uncovered_years.add((exchange, day.year))
+        print(
+            f"⚠️ No {exchange} holiday calendar for {day.year} (known through {through}); "
+            f"unlisted weekdays count as trading days. Add dates with MARKET_HOLIDAYS."
+        )
+    return day.weekday() < 5 and day not in MARKET_HOLIDAYS.get(exchange, set())
+
+
+def _session(exchange: str, day: date):
+    """(open, close) of the exchange on a local calendar day, as aware UTC datetimes."""
+    spec = EXCHANGES[exchange]
+    open_at = datetime.combine(day, spec["open"], spec["tz"]).astimezone(timezone.utc)
+    close_at = datetime.combine(day, spec["close"], spec["tz"]).astimezone(timezone.utc)
+    return open_at, close_at
+
+
+def is_market_open(exchange: str, now: datetime) -> bool:
+    """Whether the exchange is in session at `now` (aware datetime)."""
+    day = now.astimezone(EXCHANGES[exchange]["tz"]).date()
+    if not is_trading_day(exchange, day):
+        return False
+    open_at, close_at = _session(exchange, day)
+    return open_at <= now < close_at
+
+
+def next_open(exchange: str, now: datetime) -> datetime:
+    """Start of the next session strictly after `now` (aware UTC datetime)."""
+    day = now.astimezone(EXCHANGES[exchange]["tz"]).date()
+    # Long holiday stretches never exceed a couple of weeks
+    for offset in range(31):
+        candidate = day + timedelta(days=offset)
+        if is_trading_day(exchange, candidate):
+            open_at, _ = _session(exchange, candidate)
+            if open_at > now:
+                return open_at
+    return now + timedelta(days=1)
+
+
+def fresh_until(symbol: str, fetched_at: datetime) -> datetime:
+    """
+    Until when a price fetched at `fetched_at` (aware) is fresh.
+
+    In session: PRICE_TTL_MARKET_OPEN, but no later than PRICE_CLOSE_SETTLE
+    after the close, so the closing price is picked up once. Outside of a
+    session (nights, weekends, holidays): until the next open, since the price
+    cannot change and a closed market is never polled.
+    """
+    exchange = exchange_for_symbol(symbol)
+    day = fetched_at.astimezone(EXCHANGES[exchange]["tz"]).date()
+    if is_trading_day(exchange, day):
+        open_at, close_at = _session(exchange, day)
+        if open_at <= fetched_at < close_at:
+            return min(
+                fetched_at + timedelta(seconds=PRICE_TTL_MARKET_OPEN),
+                close_at + timedelta(seconds=PRICE_CLOSE_SETTLE)
+            )
+    return next_open(exchange, fetched_at)
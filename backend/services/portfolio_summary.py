@@ -0,0 +1,111 @@
+from typing import Dict, Any, Iterable
+
+REFRESH_SUMMARIES_QUERY = """
+    INSERT INTO user_portfolio_summary
+    (user_id, total_investments, total_invested, total_value, allocation, updated_at)
+    SELECT
+        u.user_id,
+        COALESCE(t.total_investments, 0),
+        COALESCE(t.total_invested, 0),
+        COALESCE(t.total_value, 0),
+        COALESCE(a.allocation, '{}'::jsonb),
+        NOW()
+    FROM UNNEST(%(user_ids)s::int[]) AS u(user_id)
+    LEFT JOIN (
+        SELECT
+            user_id,
+            COUNT(*) as total_investments,
+            COALESCE(SUM(cost_basis), 0) as total_invested,
+            COALESCE(SUM(current_value), 0) as total_value
+        FROM investments
+        WHERE user_id = ANY(%(user_ids)s)
+        GROUP BY user_id
+    ) t ON t.user_id = u.user_id
+    LEFT JOIN (
+        SELECT user_id, jsonb_object_agg(asset_type, value) as allocation
+        FROM (
+            SELECT user_id, asset_type, COALESCE(SUM(current_value), 0) as value
+            FROM investments
+            WHERE user_id = ANY(%(user_ids)s)
+            GROUP BY user_id, asset_type
+        ) per_type
+        GROUP BY user_id
+    ) a ON a.user_id = u.user_id
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        total_investments = EXCLUDED.total_investments,
+        total_invested = EXCLUDED.total_invested,
+        total_value = EXCLUDED.total_value,
+        allocation = EXCLUDED.allocation,
+        updated_at = NOW()
+"""
+
+SELECT_SUMMARY_QUERY = """
+    SELECT total_investments, total_invested, total_value, allocation
+    FROM user_portfolio_summary
+    WHERE user_id = %s
+"""
+
+
+def refresh_portfolio_summaries(cur, user_ids: Iterable[int]):
+    """
+    Recompute the user_portfolio_summary rollup rows of the given users from the
+    investments table in one statement. Users without holdings get a zero row.
+    Call this on the write's own cursor so the rollup commits (or rolls back) with it.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    cur.execute(REFRESH_SUMMARIES_QUERY, {"user_ids": user_ids})
+
+
+def format_portfolio_summary(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a user_portfolio_summary row to the API shape."""
+    return {
+        "total_investments": row["total_investments"],
+        "total_invested": float(row["total_invested"]),
+        "total_value": float(row["total_value"]),
+        "allocation": {asset_type: float(value) for asset_type, value in row["allocation"].items()}
+    }
+
+
+def get_portfolio_summary(conn, user_id: int) -> Dict[str, Any]:
+    """
+    Read the user's portfolio rollup row (a single primary-key lookup).
+    The row is rebuilt from the investments table if it does not exist yet.
+
+    Returns:
+        Dict with keys: total_investments, total_invested, total_value,
+        allocation (asset_type -> current value)
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(SELECT_SUMMARY_QUERY, (user_id,))
+        row = cur.fetchone()
+
+        if not row:
+            refresh_portfolio_summaries(cur, [user_id])
+            conn.commit()
+            cur.execute(SELECT_SUMMARY_QUERY, (user_id,))
+            row = cur.fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+    return format_portfolio_summary(row)
+
+
+async def get_portfolio_summary_async(conn, user_id: int) -> Dict[str, Any]:
+    """asyncpg variant of get_portfolio_summary (conn from get_async_db_connection)."""
+    from database import async_fetch_one, to_asyncpg_query
+
+    row = await async_fetch_one(conn, SELECT_SUMMARY_QUERY, (user_id,))
+    if not row:
+        query, params = to_asyncpg_query(REFRESH_SUMMARIES_QUERY, {"user_ids": [user_id]})
+        await conn.execute(query, *params)
+        row = await async_fetch_one(conn, SELECT_SUMMARY_QUERY, (user_id,))
+
+    return format_portfolio_summary(row)
@@ -0,0 +1,144 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Symbols per shard (one provider batch call)
+PRICE_FETCH_SHARD_SIZE = int(os.getenv("PRICE_FETCH_SHARD_SIZE", 50))
+# Shards fetched in parallel
+PRICE_FETCH_WORKERS = int(os.getenv("PRICE_FETCH_WORKERS", 8))
+# Token bucket: sustained shard calls per second, and burst size
+PRICE_FETCH_RATE = float(os.getenv("PRICE_FETCH_RATE", 4))
+PRICE_FETCH_BURST = int(os.getenv("PRICE_FETCH_BURST", PRICE_FETCH_WORKERS))
+# Attempts per shard after the first, and the base of the exponential backoff (seconds)
+PRICE_FETCH_RETRIES = int(os.getenv("PRICE_FETCH_RETRIES", 3))
+PRICE_FETCH_BACKOFF = float(os.getenv("PRICE_FETCH_BACKOFF", 0.5))
+
+ShardFetch = Callable[[List[str]], Dict[str, Optional[Dict]]]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class ShardedPriceFetcher:
+    """
+    Fetch prices for many symbols by splitting them into shards that are fetched
+    in parallel on a bounded thread pool, rate limited by a shared token bucket.
+
+    `fetch_shard` takes a list of symbols and returns symbol -> price_data, with
+    None for symbols that have no price. If it raises, or leaves symbols out of
+    its result (transient errors), those symbols are retried with exponential
+    backoff and jitter. Symbols still missing after the last attempt are
+    reported as failed instead of failing the whole run.
+    """
+
+    def __init__(
+        self,
+        fetch_shard: ShardFetch,
+        shard_size: int = PRICE_FETCH_SHARD_SIZE,
+        workers: int = PRICE_FETCH_WORKERS,
+        rate: float = PRICE_FETCH_RATE,
+        burst: int = PRICE_FETCH_BURST,
+        retries: int = PRICE_FETCH_RETRIES,
+        backoff: float = PRICE_FETCH_BACKOFF
+    ):
+        self.fetch_shard = fetch_shard
+        self.shard_size = max(1, shard_size)
+        self.workers = max(1, workers)
+        self.limiter = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch(self, symbols: List[str], stats: Optional[Dict] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Fetch all symbols.
+        If `stats` is given, it is filled with: shards, attempts, retries,
+        failed_shards (shards with at least one failed symbol), failed_symbols,
+        elapsed_ms.
+
+        Returns:
+            Dict mapping upper-cased symbol -> price_data (None if it failed)
+        """
+        start = time.perf_counter()
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        shards = [symbols[i:i + self.shard_size] for i in range(0, len(symbols), self.shard_size)]
+
+        results: Dict[str, Optional[Dict]] = {}
+        attempts = 0
+        failed_shards = 0
+        if shards:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(shards))) as executor:
+                for shard_results, shard_attempts in executor.map(self._fetch_shard_with_retry, shards):
+                    results.update(shard_results)
+                    attempts += shard_attempts
+                    failed_shards += any(price is None for price in shard_results.values())
+
+        if stats is not None:
+            failed = [symbol for symbol, price in results.items() if price is None]
+            stats.update({
+                "shards": len(shards),
+                "attempts": attempts,
+                "retries": attempts - len(shards),
+                "failed_shards": failed_shards,
+                "failed_symbols": failed,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+            })
+        return results
+
+    def _fetch_shard_with_retry(self, shard: List[str]):
+        """Fetch one shard, retrying the symbols still missing. Returns (results, attempts)."""
+        results: Dict[str, Optional[Dict]] = {}
+        pending = shard
+        attempts = 0
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+            self.limiter.acquire()
+            attempts += 1
+            try:
+                fetched = self.fetch_shard(pending)
+            except Exception as e:
+                print(f"⚠️ Price shard of {len(pending)} symbols failed (attempt {attempts}): {e}")
+                continue
+
+            # None is a definitive "no price"; absent symbols errored and are retried
+            for symbol in pending:
+                if symbol in fetched:
+                    results[symbol] = fetched[symbol]
+            pending = [symbol for symbol in pending if symbol not in results]
+            if not pending:
+                break
+
+        for symbol in pending:
+            results[symbol] = None
+        return results, attempts
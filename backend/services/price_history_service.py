@@ -0,0 +1,145 @@
+import io
+import os
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+
+# How far back a symbol with no stored history is backfilled (days)
+PRICE_HISTORY_BACKFILL_DAYS = int(os.getenv("PRICE_HISTORY_BACKFILL_DAYS", 5 * 365))
+# Symbols per provider download
+PRICE_HISTORY_BATCH_SIZE = int(os.getenv("PRICE_HISTORY_BATCH_SIZE", 100))
+
+PRICE_HISTORY_COLUMNS = ("symbol", "date", "open", "high", "low", "close", "adj_close", "volume")
+
+
+def _copy_bars(cur, bars_by_symbol: Dict[str, List[Dict]]) -> int:
+    """
+    Upsert daily bars: COPY them into a temp table, then merge into price_history
+    with one INSERT ... ON CONFLICT (COPY itself cannot upsert).
+
+    Returns:
+        Number of rows written
+    """
+    buffer = io.StringIO()
+    count = 0
+    for symbol, bars in bars_by_symbol.items():
+        for bar in bars:
+            buffer.write("\t".join(
+                "\\N" if value is None else str(value)
+                for value in (symbol, bar["date"], bar["open"], bar["high"], bar["low"],
+                              bar["close"], bar["adj_close"], bar["volume"])
+            ))
+            buffer.write("\n")
+            count += 1
+    if not count:
+        return 0
+
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS price_history_staging
+        (LIKE price_history INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+    """)
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY price_history_staging ({', '.join(PRICE_HISTORY_COLUMNS)}) FROM STDIN",
+        buffer
+    )
+    cur.execute(f"""
+        INSERT INTO price_history ({', '.join(PRICE_HISTORY_COLUMNS)})
+        SELECT {', '.join(PRICE_HISTORY_COLUMNS)} FROM price_history_staging
+        ON CONFLICT (symbol, date)
+        DO UPDATE SET
+            open = EXCLUDED.open,
+            high = EXCLUDED.high,
+            low = EXCLUDED.low,
+            close = EXCLUDED.close,
+            adj_close = EXCLUDED.adj_close,
+            volume = EXCLUDED.volume
+    """)
+    return count
+
+
+def ingest_price_history(symbols: Optional[Iterable[str]] = None, provider=None) -> Dict[str, Any]:
+    """
+    Incrementally backfill daily OHLC bars into price_history.
+
+    Each symbol (default: every held symbol) is fetched from the day after its
+    last stored bar, or PRICE_HISTORY_BACKFILL_DAYS back if it has none, up to
+    today. Symbols sharing a start date are downloaded together in batches of
+    PRICE_HISTORY_BATCH_SIZE through the price provider, and every batch is
+    COPY-loaded and committed on its own so an interrupted run resumes where it
+    stopped.
+    """
+    from database import get_db_connection
+    from services.price_providers import get_price_provider
+
+    provider = provider or get_price_provider()
+    today = date.today()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    result = {"symbols": 0, "batches": 0, "rows": 0, "failed_batches": 0}
+
+    try:
+        if symbols is None:
+            cur.execute("SELECT DISTINCT symbol FROM investments")
+            symbols = [row["symbol"] for row in cur.fetchall()]
+        symbols = sorted(set(symbol.upper() for symbol in symbols))
+        result["symbols"] = len(symbols)
+
+        cur.execute("""
+            SELECT symbol, MAX(date) AS last_date
+            FROM price_history
+            WHERE symbol = ANY(%s)
+            GROUP BY symbol
+        """, (symbols,))
+        last_dates = {row["symbol"]: row["last_date"] for row in cur.fetchall()}
+
+        # Group by start date so up-to-date symbols share one download
+        by_start: Dict[date, List[str]] = {}
+        default_start = today - timedelta(days=PRICE_HISTORY_BACKFILL_DAYS)
+        for symbol in symbols:
+            last_date = last_dates.get(symbol)
+            start = last_date + timedelta(days=1) if last_date else default_start
+            if start <= today:
+                by_start.setdefault(start, []).append(symbol)
+
+        for start, group in sorted(by_start.items()):
+            for i in range(0, len(group), PRICE_HISTORY_BATCH_SIZE):
+                batch = group[i:i + PRICE_HISTORY_BATCH_SIZE]
+                result["batches"] += 1
+                try:
+                    bars = provider.fetch_history(batch, start, today)
+                    result["rows"] += _copy_bars(cur, bars)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    result["failed_batches"] += 1
+                    print(f"❌ Error ingesting price history for {len(batch)} symbols from {start}: {e}")
+
+        print(f"🕯️ Ingested price history: {result}")
+    finally:
+        cur.close()
+        conn.close()
+
+    return result
+
+
+def build_price_history_query(symbol: str, start_date: date, end_date: Optional[date] = None):
+    """
+    Query for the daily bars of a symbol between two dates (inclusive), oldest
+    first, served by the (symbol, date) primary key.
+
+    Returns:
+        (query, params) with psycopg2 placeholders
+    """
+    return """
+        SELECT date, open, high, low, close, adj_close, volume
+        FROM price_history
+        WHERE symbol = %s AND date >= %s AND date <= %s
+        ORDER BY date ASC
+    """, [symbol.upper(), start_date, end_date or date.today()]
+
+
+def load_price_history(cur, symbol: str, start_date: date, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Daily bars of a symbol between two dates (inclusive), oldest first."""
+    query, params = build_price_history_query(symbol, start_date, end_date)
+    cur.execute(query, params)
+    return cur.fetchall()
@@ -0,0 +1,287 @@
+import csv
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, date
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Which price feed PriceService uses: "yfinance" (default) or "replay"
+PRICE_PROVIDER = os.getenv("PRICE_PROVIDER", "yfinance")
+
+# Replay provider: recorded quotes file (.csv or .parquet), injected latency per call
+PRICE_REPLAY_FILE = os.getenv("PRICE_REPLAY_FILE")
+PRICE_REPLAY_LATENCY_MS = float(os.getenv("PRICE_REPLAY_LATENCY_MS", 0))
+PRICE_REPLAY_JITTER_MS = float(os.getenv("PRICE_REPLAY_JITTER_MS", 0))
+PRICE_REPLAY_SEED = int(os.getenv("PRICE_REPLAY_SEED", 42))
+
+
+def build_price_data(symbol: str, current_price: float, previous_close: Optional[float]) -> Dict:
+    """Price data dict in the shape cached and returned by PriceService."""
+    change = current_price - previous_close if previous_close else 0
+    change_percent = (change / previous_close * 100) if previous_close else 0
+
+    return {
+        "symbol": symbol.upper(),
+        "price": round(current_price, 2),
+        "previous_close": round(previous_close, 2) if previous_close else None,
+        "change": round(change, 2),
+        "change_percent": round(change_percent, 2),
+        "updated_at": datetime.utcnow().isoformat()
+    }
+
+
+class PriceProvider(ABC):
+    """
+    A source of live quotes.
+
+    fetch_quote returns price data for one symbol, or None if it has no price.
+    fetch_quotes does the same for a batch (one ShardedPriceFetcher shard):
+    symbols without a price map to None, and symbols whose lookup failed
+    transiently are left out so they get retried.
+    fetch_history returns daily OHLC bars for a batch of symbols.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def fetch_quote(self, symbol: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def fetch_history(self, symbols: List[str], start: date, end: date) -> Dict[str, List[Dict]]:
+        """
+        Daily bars from start to end (inclusive) for each symbol.
+
+        Returns:
+            Dict mapping upper-cased symbol -> list of dicts with keys: date, open,
+            high, low, close, adj_close, volume (symbols without data are left out)
+        """
+
+    def fetch_quotes(self, symbols: List[str]) -> Dict[str, Optional[Dict]]:
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol.upper()] = self.fetch_quote(symbol)
+            except Exception as e:
+                print(f"Error fetching {symbol}: {e}")
+        return results
+
+
+class YFinanceProvider(PriceProvider):
+    """Quotes from Yahoo Finance through yfinance."""
+
+    name = "yfinance"
+
+    def fetch_quote(self, symbol: str) -> Optional[Dict]:
+        import yfinance as yf
+
+        ticker = yf.Ticker(symbol)
+        info = ticker.fast_info
+
+        current_price = info.get('lastPrice') or info.get('regularMarketPrice')
+        previous_close = info.get('previousClose') or info.get('regularMarketPreviousClose')
+
+        if current_price is None:
+            # Try getting from history as fallback
+            hist = ticker.history(period="1d")
+            if not hist.empty:
+                current_price = float(hist['Close'].iloc[-1])
+                previous_close = float(hist['Open'].iloc[0]) if previous_close is None else previous_close
+
+        if current_price is None:
+            return None
+        return build_price_data(symbol, current_price, previous_close)
+
+    def fetch_quotes(self, symbols: List[str]) -> Dict[str, Optional[Dict]]:
+        import yfinance as yf
+
+        results = {}
+        tickers = yf.Tickers(" ".join(symbols))
+
+        for symbol in symbols:
+            try:
+                ticker = tickers.tickers.get(symbol.upper())
+                if not ticker:
+                    results[symbol.upper()] = None
+                    continue
+
+                info = ticker.fast_info
+                current_price = info.get('lastPrice') or info.get('regularMarketPrice')
+                previous_close = info.get('previousClose')
+
+                results[symbol.upper()] = build_price_data(symbol, current_price, previous_close) if current_price else None
+            except Exception as e:
+                print(f"Error fetching {symbol}: {e}")
+
+        return results
+
+    def fetch_history(self, symbols: List[str], start: date, end: date) -> Dict[str, List[Dict]]:
+        import pandas as pd
+        import yfinance as yf
+
+        # One batched download for all symbols (yf.download's end is exclusive)
+        frame = yf.download(
+            symbols,
+            start=start.isoformat(),
+            end=(pd.Timestamp(end) + pd.Timedelta(days=1)).date().isoformat(),
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            progress=False,
+            threads=True
+        )
+        if frame is None or frame.empty:
+            return {}
+
+        results = {}
+        for symbol in symbols:
+            if isinstance(frame.columns, pd.MultiIndex):
+                if symbol not in frame.columns.get_level_values(0):
+                    continue
+                bars = frame[symbol]
+            else:
+                bars = frame
+            bars = bars.dropna(subset=["Close"])
+            if bars.empty:
+                continue
+            results[symbol.upper()] = [
+                {
+                    "date": day.date(),
+                    "open": _float_or_none(bar.get("Open")),
+                    "high": _float_or_none(bar.get("High")),
+                    "low": _float_or_none(bar.get("Low")),
+                    "close": float(bar["Close"]),
+                    "adj_close": _float_or_none(bar.get("Adj Close")),
+                    "volume": int(bar["Volume"]) if pd.notna(bar.get("Volume")) else None
+                }
+                for day, bar in bars.iterrows()
+            ]
+        return results
+
+
+def _float_or_none(value) -> Optional[float]:
+    """float(value), or None for missing / NaN values."""
+    if value is None or value != value:
+        return None
+    return float(value)
+
+
+class ReplayPriceProvider(PriceProvider):
+    """
+    Deterministic, offline quotes replayed from a recorded file, for benchmarks
+    and load tests.
+
+    The file (.csv, or .parquet which needs pyarrow) needs `symbol` and `price`
+    columns, and may have `previous_close`. Rows of the same symbol are replayed
+    in file order, one per call, wrapping around at the end. Every call (single
+    or batch) sleeps latency_ms plus up to jitter_ms drawn from a seeded RNG, to
+    mimic a remote feed.
+    Rows with a `date` column (and optionally open / high / low / volume) also
+    serve fetch_history, with `price` as the close.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        path: str,
+        latency_ms: float = PRICE_REPLAY_LATENCY_MS,
+        jitter_ms: float = PRICE_REPLAY_JITTER_MS,
+        seed: int = PRICE_REPLAY_SEED
+    ):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+        self._quotes, self._bars = self._load(path)
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        print(f"📼 Replaying quotes for {len(self._quotes)} symbols from {path}")
+
+    @staticmethod
+    def _load(path: str):
+        """
+        Read the recording into symbol -> [(price, previous_close), ...] and,
+        for dated rows, symbol -> [daily bar, ...].
+        """
+        if path.endswith(".parquet"):
+            import pandas as pd
+            rows = pd.read_parquet(path).to_dict("records")
+        else:
+            with open(path, newline="") as f:
+                rows = list(csv.DictReader(f))
+
+        def number(row, column):
+            value = row.get(column)
+            return float(value) if value not in (None, "") else None
+
+        quotes: Dict[str, List[tuple]] = {}
+        bars: Dict[str, List[Dict]] = {}
+        for row in rows:
+            symbol = str(row["symbol"]).strip().upper()
+            price = float(row["price"])
+            quotes.setdefault(symbol, []).append((price, number(row, "previous_close")))
+            if row.get("date") not in (None, ""):
+                volume = number(row, "volume")
+                bars.setdefault(symbol, []).append({
+                    "date": date.fromisoformat(str(row["date"])[:10]),
+                    "open": number(row, "open"),
+                    "high": number(row, "high"),
+                    "low": number(row, "low"),
+                    "close": price,
+                    "adj_close": number(row, "adj_close"),
+                    "volume": int(volume) if volume is not None else None
+                })
+        return quotes, bars
+
+    def _simulate_latency(self):
+        if self.latency_ms <= 0 and self.jitter_ms <= 0:
+            return
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else 0
+        time.sleep((self.latency_ms + jitter) / 1000)
+
+    def _next_quote(self, symbol: str) -> Optional[Dict]:
+        symbol = symbol.upper()
+        with self._lock:
+            recorded = self._quotes.get(symbol)
+            if not recorded:
+                return None
+            position = self._positions.get(symbol, 0)
+            self._positions[symbol] = position + 1
+        price, previous_close = recorded[position % len(recorded)]
+        return build_price_data(symbol, price, previous_close)
+
+    def fetch_quote(self, symbol: str) -> Optional[Dict]:
+        self._simulate_latency()
+        return self._next_quote(symbol)
+
+    def fetch_quotes(self, symbols: List[str]) -> Dict[str, Optional[Dict]]:
+        self._simulate_latency()
+        return {symbol.upper(): self._next_quote(symbol) for symbol in symbols}
+
+    def fetch_history(self, symbols: List[str], start: date, end: date) -> Dict[str, List[Dict]]:
+        self._simulate_latency()
+        results = {}
+        for symbol in symbols:
+            bars = [bar for bar in self._bars.get(symbol.upper(), []) if start <= bar["date"] <= end]
+            if bars:
+                results[symbol.upper()] = bars
+        return results
+
+
+def get_price_provider(name: Optional[str] = None) -> PriceProvider:
+    """Build the provider selected by PRICE_PROVIDER (or `name`)."""
+    name = (name or PRICE_PROVIDER).lower()
+    if name == "yfinance":
+        return YFinanceProvider()
+    if name == "replay":
+        if not PRICE_REPLAY_FILE:
+            raise ValueError("PRICE_PROVIDER=replay requires PRICE_REPLAY_FILE")
+        return ReplayPriceProvider(PRICE_REPLAY_FILE)
+    raise ValueError(f"Unknown price provider: {name}")
@@ -1,151 +1,517 @@
 
 
-import yfinance as yf
 import redis
 import json
 import os
-from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional, Dict, List
 from dotenv import load_dotenv
+from services.price_fetcher import ShardedPriceFetcher
+from services.price_providers import PriceProvider, get_price_provider
+from services.market_calendar import fresh_until, exchange_for_symbol
+from services.redis_pool import get_redis_client, redis_breaker
 
 load_dotenv()
 
-# Redis configuration
-REDIS_URL = os.getenv("REDIS_URL")
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-REDIS_DB = int(os.getenv("REDIS_DB", 0))
-REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+# Cached prices are fresh until market_calendar.fresh_until (per-exchange
+# sessions); stale ones are kept this much longer (seconds) so they can be
+# served while a background refresh runs
+PRICE_STALE_GRACE = int(os.getenv("PRICE_STALE_GRACE", 6 * 3600))
+# Threads running background (stale-while-revalidate) refreshes
+PRICE_REFRESH_WORKERS = int(os.getenv("PRICE_REFRESH_WORKERS", 4))
 
-# Cache TTL in seconds (15 minutes for market hours, 1 hour otherwise)
-CACHE_TTL_MARKET = 900  # 15 minutes
-CACHE_TTL_OFF_HOURS = 3600  # 1 hour
+# Incremental price update: symbols whose investments were all repriced within
+# this many minutes are not fetched again
+PRICE_UPDATE_MIN_AGE_MINUTES = int(os.getenv("PRICE_UPDATE_MIN_AGE_MINUTES", 60))
 
+# Keys per MGET / pipelined SETEX round-trip
+CACHE_BATCH_SIZE = 500
 
-class PriceService:
-    """Service for fetching and caching stock prices."""
+# Pub/sub channel every cached price update is published on (see price_stream)
+PRICE_UPDATES_CHANNEL = os.getenv("PRICE_UPDATES_CHANNEL", "prices:updates")
+
+# Redis layout of cached prices:
+# "json" - one JSON string key price:{SYMBOL} per symbol, expiring on its own
+# "hash" - one hash prices:{EXCHANGE} per exchange, symbol -> fixed-width
+#          _PRICE_RECORD; expiry is checked on read and expired fields dropped
+PRICE_CACHE_LAYOUT = os.getenv("PRICE_CACHE_LAYOUT", "json")
+# Hash layout: lifetime of a whole exchange hash, renewed on every write (seconds)
+PRICE_HASH_TTL = int(os.getenv("PRICE_HASH_TTL", 7 * 24 * 3600))
+# price, previous_close (NaN if unknown), change, change_percent, updated_at (epoch),
+# fresh_until and expires_at (epoch seconds)
+_PRICE_RECORD = struct.Struct("<5d2I")
+
+# In-process (L1) cache in front of Redis: max symbols kept (0 disables it), and
+# how long past expiry an entry may still be served while Redis is unreachable
+PRICE_L1_MAX_SIZE = int(os.getenv("PRICE_L1_MAX_SIZE", 2048))
+PRICE_L1_OUTAGE_GRACE = int(os.getenv("PRICE_L1_OUTAGE_GRACE", 600))
+
+
+# Single-flight fetches: lifetime of the cross-process Redis lock, and how long
+# other callers wait for the lock holder's result before fetching themselves
+PRICE_FETCH_LOCK_TTL_MS = int(os.getenv("PRICE_FETCH_LOCK_TTL_MS", 10000))
+PRICE_FETCH_WAIT_TIMEOUT = float(os.getenv("PRICE_FETCH_WAIT_TIMEOUT", 10))
+PRICE_FETCH_POLL_INTERVAL = 0.05
+
+# Deletes the lock only if it still holds our token (it may have expired and been re-taken)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _epoch(utc_iso: str) -> float:
+    """Epoch seconds of a naive UTC ISO timestamp (the format of updated_at)."""
+    return datetime.fromisoformat(utc_iso).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _utc_iso(epoch: float) -> str:
+    """Naive UTC ISO timestamp of epoch seconds (inverse of _epoch)."""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def pack_price(price_data: Dict) -> bytes:
+    """Encode stamped price data as a _PRICE_RECORD (the symbol is the hash field)."""
+    previous_close = price_data.get("previous_close")
+    return _PRICE_RECORD.pack(
+        price_data["price"],
+        float("nan") if previous_close is None else previous_close,
+        price_data.get("change") or 0,
+        price_data.get("change_percent") or 0,
+        _epoch(price_data["updated_at"]),
+        int(_epoch(price_data["fresh_until"])),
+        int(_epoch(price_data["expires_at"]))
+    )
+
+
+def unpack_price(symbol: str, record: bytes) -> Dict:
+    """Decode a _PRICE_RECORD into the price data dict fetch_prices_batch returns."""
+    price, previous_close, change, change_percent, updated_at, fresh, expires = _PRICE_RECORD.unpack(record)
+    return {
+        "symbol": symbol,
+        "price": price,
+        "previous_close": None if previous_close != previous_close else previous_close,
+        "change": change,
+        "change_percent": change_percent,
+        "updated_at": _utc_iso(updated_at),
+        "fresh_until": _utc_iso(fresh),
+        "expires_at": _utc_iso(expires)
+    }
+
+
+class _Flight:
+    """An in-progress fetch that concurrent callers of the same symbol wait on."""
     
     def __init__(self):
-        self.redis_client = None
-        self._connect_redis()
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
+
+
+class LocalPriceCache:
+    """
+    Thread-safe LRU of price data. Entries are hits until their fresh_until;
+    after that Redis (shared with the other workers and the price jobs) is asked
+    first, and the entry is only a fallback while Redis is unreachable.
+    """
     
-    def _connect_redis(self):
-        """Initialize Redis connection."""
-        try:
-            if REDIS_URL:
-                self.redis_client = redis.from_url(
-                    REDIS_URL,
-                    decode_responses=True,
-                    socket_connect_timeout=5
-                )
-            else:
-                self.redis_client = redis.Redis(
-                    host=REDIS_HOST,
-                    port=REDIS_PORT,
-                    db=REDIS_DB,
-                    password=REDIS_PASSWORD,
-                    decode_responses=True,
-                    socket_connect_timeout=5
+    def __init__(self, max_size: int = PRICE_L1_MAX_SIZE, outage_grace: int = PRICE_L1_OUTAGE_GRACE):
+        self.max_size = max_size
+        self.outage_grace = outage_grace
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+    
+    def get_many(self, symbols: List[str], allow_stale: bool = False) -> Dict[str, Dict]:
+        """
+        Return the fresh cached entries of the given (upper-cased) symbols.
+        With allow_stale, stale entries up to outage_grace seconds past expiry
+        are served too.
+        """
+        now = time.time()
+        results = {}
+        with self._lock:
+            for symbol in symbols:
+                entry = self._entries.get(symbol)
+                if entry is None:
+                    continue
+                price_data, fresh_at, expires_at = entry
+                if now < fresh_at:
+                    self.hits += 1
+                elif allow_stale and now < expires_at + self.outage_grace:
+                    self.stale_hits += 1
+                else:
+                    continue
+                self._entries.move_to_end(symbol)
+                results[symbol] = price_data
+            if not allow_stale:
+                self.misses += len(symbols) - len(results)
+        return results
+    
+    def set_many(self, prices: Dict[str, Dict]):
+        """Store stamped price data (see PriceService._stamp) with its fresh_until and expires_at."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for symbol, price_data in prices.items():
+                self._entries[symbol] = (
+                    price_data, _epoch(price_data["fresh_until"]), _epoch(price_data["expires_at"])
                 )
-            # Test connection
-            self.redis_client.ping()
-            print("✅ Redis connected successfully")
-        except redis.ConnectionError as e:
-            print(f"⚠️ Redis connection failed: {e}. Falling back to direct API calls.")
-            self.redis_client = None
+                self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        """Hit / miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale_hits": self.stale_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class PriceService:
+    """Service for fetching and caching stock prices from a pluggable PriceProvider."""
+    
+    def __init__(self, provider: Optional[PriceProvider] = None):
+        self.provider = provider or get_price_provider()
+        # One fetcher (and token bucket) for every batch of the process - the
+        # price jobs and on-demand batches share the provider's rate limit
+        self.fetcher = ShardedPriceFetcher(self.provider.fetch_quotes)
+        self.local_cache = LocalPriceCache()
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        self._refreshing = set()
+        self._refresh_executor = None
+        self.background_refreshes = 0
+    
+    @staticmethod
+    def _redis() -> Optional[redis.Redis]:
+        """
+        Client on the process-wide pool (non-decoding for the binary hash layout),
+        or None while the Redis circuit breaker is open. Take it once per operation.
+        """
+        return get_redis_client(decode_responses=PRICE_CACHE_LAYOUT != "hash")
+    
+    @staticmethod
+    def _redis_failed(action: str, error: Exception):
+        redis_breaker.record_failure()
+        print(f"Redis error {action}: {error}")
     
     def _get_cache_key(self, symbol: str) -> str:
         """Generate cache key for a symbol."""
         return f"price:{symbol.upper()}"
     
-    def _is_market_hours(self) -> bool:
-        """Check if US stock market is open (simplified check)."""
-        now = datetime.utcnow()
-        # Market hours: 9:30 AM - 4:00 PM ET (14:30 - 21:00 UTC)
-        # Weekdays only
-        if now.weekday() >= 5:  # Saturday or Sunday
-            return False
-        hour = now.hour
-        return 14 <= hour < 21
+    @staticmethod
+    def _get_hash_key(exchange: str) -> str:
+        """Hash holding the packed prices of an exchange's symbols (hash layout)."""
+        return f"prices:{exchange}"
     
-    def get_price_from_cache(self, symbol: str) -> Optional[Dict]:
-        """Get cached price data for a symbol."""
-        if not self.redis_client:
-            return None
+    def _read_redis(self, client: redis.Redis, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Read upper-cased symbols from Redis in the configured layout: one MGET,
+        or one HMGET per exchange hash, per CACHE_BATCH_SIZE symbols.
+        Raises redis.RedisError.
+        """
+        found = {}
+        for i in range(0, len(symbols), CACHE_BATCH_SIZE):
+            chunk = symbols[i:i + CACHE_BATCH_SIZE]
+            if PRICE_CACHE_LAYOUT != "hash":
+                values = client.mget([self._get_cache_key(symbol) for symbol in chunk])
+                for symbol, cached in zip(chunk, values):
+                    if cached:
+                        found[symbol] = json.loads(cached)
+                continue
+            
+            by_exchange: Dict[str, List[str]] = {}
+            for symbol in chunk:
+                by_exchange.setdefault(exchange_for_symbol(symbol), []).append(symbol)
+            pipe = client.pipeline(transaction=False)
+            for exchange, group in by_exchange.items():
+                pipe.hmget(self._get_hash_key(exchange), group)
+            now = time.time()
+            expired: Dict[str, List[str]] = {}
+            for (exchange, group), records in zip(by_exchange.items(), pipe.execute()):
+                for symbol, record in zip(group, records):
+                    if not record:
+                        continue
+                    price_data = unpack_price(symbol, record)
+                    if _epoch(price_data["expires_at"]) > now:
+                        found[symbol] = price_data
+                    else:
+                        expired.setdefault(exchange, []).append(symbol)
+            if expired:
+                pipe = client.pipeline(transaction=False)
+                for exchange, group in expired.items():
+                    pipe.hdel(self._get_hash_key(exchange), *group)
+                pipe.execute()
+        return found
+    
+    @staticmethod
+    def _stamp(price_data: Dict) -> Dict:
+        """
+        Add the cache lifetimes to fetched price data:
+        fresh_until - served as is until then (market-calendar aware)
+        expires_at - dropped from the cache; stale in between
+        """
+        if "fresh_until" in price_data:
+            return price_data
+        fetched_at = datetime.fromisoformat(price_data.get("updated_at") or datetime.utcnow().isoformat())
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+        fresh = fresh_until(price_data.get("symbol", ""), fetched_at).astimezone(timezone.utc).replace(tzinfo=None)
+        return {
+            **price_data,
+            "fresh_until": fresh.isoformat(),
+            "expires_at": (fresh + timedelta(seconds=PRICE_STALE_GRACE)).isoformat()
+        }
+    
+    @staticmethod
+    def is_fresh(price_data: Dict) -> bool:
+        """Whether cached price data is still within its fresh_until."""
+        return "fresh_until" in price_data and time.time() < _epoch(price_data["fresh_until"])
+    
+    def get_prices_from_cache(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        Get cached price data for many symbols.
+        The in-process L1 cache answers for fresh entries; the rest (including stale
+        L1 entries, which another worker may have refreshed) is read from Redis with
+        one MGET per CACHE_BATCH_SIZE keys and kept in L1. While Redis is
+        unreachable, stale and recently expired L1 entries are served instead of
+        falling through to the provider.
+        
+        Returns:
+            Dict mapping upper-cased symbol -> price_data (misses are left out)
+        """
+        if not symbols:
+            return {}
+        
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        results = self.local_cache.get_many(symbols)
+        remaining = [symbol for symbol in symbols if symbol not in results]
+        if not remaining:
+            return results
+        
+        client = self._redis()
+        if not client:
+            results.update(self.local_cache.get_many(remaining, allow_stale=True))
+            return results
         
+        from_redis = {}
         try:
-            cached = self.redis_client.get(self._get_cache_key(symbol))
-            if cached:
-                return json.loads(cached)
+            from_redis = self._read_redis(client, remaining)
+            redis_breaker.record_success()
         except redis.RedisError as e:
-            print(f"Redis error getting cache: {e}")
+            self._redis_failed("getting cache", e)
+            results.update(self.local_cache.get_many(
+                [symbol for symbol in remaining if symbol not in from_redis], allow_stale=True
+            ))
         
-        return None
+        self.local_cache.set_many(from_redis)
+        results.update(from_redis)
+        return results
     
-    def set_price_in_cache(self, symbol: str, price_data: Dict) -> bool:
-        """Cache price data for a symbol."""
-        if not self.redis_client:
-            return False
+    def set_prices_in_cache(self, prices: Dict[str, Dict]) -> int:
+        """
+        Cache price data for many symbols in L1 and in Redis, with one pipelined
+        round-trip per CACHE_BATCH_SIZE keys: a SETEX per key that expires at its
+        own expires_at (see _stamp), or in the hash layout one HSET of packed
+        records per exchange. The same round-trip publishes the chunk as one
+        message on PRICE_UPDATES_CHANNEL for the live price streams.
+        
+        Returns:
+            Number of symbols written to Redis
+        """
+        items = {symbol.upper(): self._stamp(price_data) for symbol, price_data in prices.items() if price_data}
+        if not items:
+            return 0
         
+        self.local_cache.set_many(items)
+        client = self._redis()
+        if not client:
+            return 0
+        
+        now = time.time()
+        items = list(items.items())
+        written = 0
         try:
-            ttl = CACHE_TTL_MARKET if self._is_market_hours() else CACHE_TTL_OFF_HOURS
-            self.redis_client.setex(
-                self._get_cache_key(symbol),
-                ttl,
-                json.dumps(price_data)
-            )
-            return True
+            for i in range(0, len(items), CACHE_BATCH_SIZE):
+                chunk = items[i:i + CACHE_BATCH_SIZE]
+                if PRICE_CACHE_LAYOUT == "hash":
+                    pipe = client.pipeline(transaction=False)
+                    by_exchange: Dict[str, Dict[str, bytes]] = {}
+                    for symbol, price_data in chunk:
+                        by_exchange.setdefault(exchange_for_symbol(symbol), {})[symbol] = pack_price(price_data)
+                    for exchange, records in by_exchange.items():
+                        pipe.hset(self._get_hash_key(exchange), mapping=records)
+                        pipe.expire(self._get_hash_key(exchange), PRICE_HASH_TTL)
+                else:
+                    pipe = client.pipeline(transaction=False)
+                    for symbol, price_data in chunk:
+                        ttl = max(1, int(_epoch(price_data["expires_at"]) - now))
+                        pipe.setex(self._get_cache_key(symbol), ttl, json.dumps(price_data))
+                pipe.publish(PRICE_UPDATES_CHANNEL, json.dumps([
+                    {key: value for key, value in price_data.items() if key not in ("fresh_until", "expires_at")}
+                    for _, price_data in chunk
+                ]))
+                replies = pipe.execute()
+                # HSET replies count new fields only; the last reply is PUBLISH's subscriber count
+                written += len(chunk) if PRICE_CACHE_LAYOUT == "hash" else sum(1 for ok in replies[:-1] if ok)
+            redis_breaker.record_success()
         except redis.RedisError as e:
-            print(f"Redis error setting cache: {e}")
-            return False
+            self._redis_failed("setting cache", e)
+        
+        return written
+    
+    def get_cache_stats(self) -> Dict:
+        """Hit / miss counters of the in-process price cache, and the Redis circuit breaker."""
+        return {
+            **self.local_cache.stats(),
+            "background_refreshes": self.background_refreshes,
+            "redis": redis_breaker.stats()
+        }
+    
+    def get_price_from_cache(self, symbol: str) -> Optional[Dict]:
+        """Get cached price data for a symbol."""
+        return self.get_prices_from_cache([symbol]).get(symbol.upper())
+    
+    def set_price_in_cache(self, symbol: str, price_data: Dict) -> bool:
+        """Cache price data for a symbol."""
+        return self.set_prices_in_cache({symbol: price_data}) == 1
     
     def fetch_price(self, symbol: str, force_refresh: bool = False) -> Optional[Dict]:
         """
         Fetch current price for a symbol.
-        Checks cache first, then falls back to yfinance API.
+        Checks cache first, then falls back to the price provider (yfinance by default).
+        A stale cached price (past fresh_until) is returned right away while a
+        background refresh fetches a new one (stale-while-revalidate).
+        Concurrent misses for the same symbol are coalesced into one provider call
+        (see _fetch_single_flight).
         
         Returns:
-            Dict with keys: price, previous_close, change, change_percent, updated_at
+            Dict with keys: price, previous_close, change, change_percent, updated_at,
+            fresh_until
         """
         # Check cache first (unless force refresh)
         if not force_refresh:
             cached = self.get_price_from_cache(symbol)
             if cached:
-                print(f"📦 Cache hit for {symbol}")
+                if self.is_fresh(cached):
+                    print(f"📦 Cache hit for {symbol}")
+                else:
+                    print(f"♻️ Serving stale price for {symbol}, refreshing in background")
+                    self._refresh_in_background(symbol)
                 return cached
         
-        # Fetch from yfinance
+        return self._fetch_single_flight(symbol)
+    
+    def _refresh_in_background(self, symbol: str):
+        """Queue one background refresh per symbol (further requests keep the stale price)."""
+        key = symbol.upper()
+        with self._flights_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=PRICE_REFRESH_WORKERS, thread_name_prefix="price-refresh"
+                )
+            self.background_refreshes += 1
+        self._refresh_executor.submit(self._background_refresh, key)
+    
+    def _background_refresh(self, symbol: str):
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.fast_info
-            
-            current_price = info.get('lastPrice') or info.get('regularMarketPrice')
-            previous_close = info.get('previousClose') or info.get('regularMarketPreviousClose')
-            
-            if current_price is None:
-                # Try getting from history as fallback
-                hist = ticker.history(period="1d")
-                if not hist.empty:
-                    current_price = float(hist['Close'].iloc[-1])
-                    previous_close = float(hist['Open'].iloc[0]) if previous_close is None else previous_close
+            self._fetch_single_flight(symbol)
+        finally:
+            with self._flights_lock:
+                self._refreshing.discard(symbol)
+    
+    def _fetch_single_flight(self, symbol: str) -> Optional[Dict]:
+        """
+        Run at most one fetch per symbol at a time.
+        Within the process, the first caller (the leader) fetches and later callers
+        wait for its result. Across processes, the leader also takes a short Redis
+        lock; leaders in other processes wait for the lock to go away and then read
+        the freshly cached price.
+        """
+        key = symbol.upper()
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        
+        if not leader:
+            # The leader may itself wait out another process's lock before fetching
+            if flight.done.wait(PRICE_FETCH_WAIT_TIMEOUT * 2):
+                return flight.result
+            return self._fetch_price_uncached(symbol)
+        
+        try:
+            flight.result = self._fetch_with_redis_lock(symbol)
+            return flight.result
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+    
+    def _fetch_with_redis_lock(self, symbol: str) -> Optional[Dict]:
+        """Fetch under the cross-process lock, or wait for the process that holds it."""
+        client = self._redis()
+        if not client:
+            return self._fetch_price_uncached(symbol)
+        
+        lock_key = f"lock:{self._get_cache_key(symbol)}"
+        token = uuid.uuid4().hex
+        started_at = time.time()
+        try:
+            if not client.set(lock_key, token, nx=True, px=PRICE_FETCH_LOCK_TTL_MS):
+                deadline = time.monotonic() + PRICE_FETCH_WAIT_TIMEOUT
+                while time.monotonic() < deadline and client.exists(lock_key):
+                    time.sleep(PRICE_FETCH_POLL_INTERVAL)
+                price_data = self._read_redis(client, [symbol.upper()]).get(symbol.upper())
+                # Only a price written after we started waiting counts (force refreshes)
+                if price_data and "updated_at" in price_data and _epoch(price_data["updated_at"]) >= started_at:
+                    self.local_cache.set_many({symbol.upper(): price_data})
+                    return price_data
+                # The holder failed or timed out: fetch ourselves
+                return self._fetch_price_uncached(symbol)
+        except redis.RedisError as e:
+            self._redis_failed("on fetch lock", e)
+            return self._fetch_price_uncached(symbol)
+        
+        try:
+            return self._fetch_price_uncached(symbol)
+        finally:
+            try:
+                client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except redis.RedisError as e:
+                self._redis_failed("releasing fetch lock", e)
+    
+    def _fetch_price_uncached(self, symbol: str) -> Optional[Dict]:
+        """Fetch a price from the provider and cache it."""
+        try:
+            price_data = self.provider.fetch_quote(symbol)
             
-            if current_price is None:
+            if price_data is None:
                 print(f"❌ No price data available for {symbol}")
                 return None
             
-            change = current_price - previous_close if previous_close else 0
-            change_percent = (change / previous_close * 100) if previous_close else 0
-            
-            price_data = {
-                "symbol": symbol.upper(),
-                "price": round(current_price, 2),
-                "previous_close": round(previous_close, 2) if previous_close else None,
-                "change": round(change, 2),
-                "change_percent": round(change_percent, 2),
-                "updated_at": datetime.utcnow().isoformat()
-            }
-            
             # Cache the result
+            price_data = self._stamp(price_data)
             self.set_price_in_cache(symbol, price_data)
             print(f"🌐 Fetched price for {symbol}: ${price_data['price']}")
             
@@ -155,163 +521,219 @@ class PriceService:
             print(f"❌ Error fetching price for {symbol}: {e}")
             return None
     
-    def fetch_prices_batch(self, symbols: List[str]) -> Dict[str, Optional[Dict]]:
+    def fetch_prices_batch(self, symbols: List[str], stats: Optional[Dict] = None) -> Dict[str, Optional[Dict]]:
         """
         Fetch prices for multiple symbols.
-        Uses batch download for efficiency.
+        Cache misses are fetched in parallel shards by the service's
+        ShardedPriceFetcher (rate limited across all concurrent batches, retried
+        per shard); the cache is read and written in batches
+        (see get_prices_from_cache / set_prices_in_cache).
+        If `stats` is given, it is filled with cache_hits plus the fetcher's stats.
         
         Returns:
             Dict mapping symbol -> price_data
         """
-        results = {}
-        symbols_to_fetch = []
-        
-        # Check cache first
-        for symbol in symbols:
-            cached = self.get_price_from_cache(symbol)
-            if cached:
-                results[symbol.upper()] = cached
-            else:
-                symbols_to_fetch.append(symbol)
+        # Check cache first (stale entries are fetched again)
+        results = {
+            symbol: price_data
+            for symbol, price_data in self.get_prices_from_cache(symbols).items()
+            if self.is_fresh(price_data)
+        }
+        symbols_to_fetch = [symbol for symbol in symbols if symbol.upper() not in results]
+        if stats is not None:
+            stats["cache_hits"] = len(results)
         
         if not symbols_to_fetch:
             return results
         
-        # Batch fetch remaining symbols
-        try:
-            tickers = yf.Tickers(" ".join(symbols_to_fetch))
-            
-            for symbol in symbols_to_fetch:
-                try:
-                    ticker = tickers.tickers.get(symbol.upper())
-                    if ticker:
-                        info = ticker.fast_info
-                        current_price = info.get('lastPrice') or info.get('regularMarketPrice')
-                        previous_close = info.get('previousClose')
-                        
-                        if current_price:
-                            change = current_price - previous_close if previous_close else 0
-                            change_percent = (change / previous_close * 100) if previous_close else 0
-                            
-                            price_data = {
-                                "symbol": symbol.upper(),
-                                "price": round(current_price, 2),
-                                "previous_close": round(previous_close, 2) if previous_close else None,
-                                "change": round(change, 2),
-                                "change_percent": round(change_percent, 2),
-                                "updated_at": datetime.utcnow().isoformat()
-                            }
-                            
-                            self.set_price_in_cache(symbol, price_data)
-                            results[symbol.upper()] = price_data
-                        else:
-                            results[symbol.upper()] = None
-                    else:
-                        results[symbol.upper()] = None
-                except Exception as e:
-                    print(f"Error fetching {symbol}: {e}")
-                    results[symbol.upper()] = None
-                    
-        except Exception as e:
-            print(f"Batch fetch error: {e}")
-            # Fall back to individual fetches
-            for symbol in symbols_to_fetch:
-                results[symbol.upper()] = self.fetch_price(symbol)
-        
+        fetched = self.fetcher.fetch(symbols_to_fetch, stats)
+        fetched = {symbol: self._stamp(price_data) if price_data else None for symbol, price_data in fetched.items()}
+        self.set_prices_in_cache({symbol: price_data for symbol, price_data in fetched.items() if price_data})
+        results.update(fetched)
         return results
 
 
-def update_all_investment_prices():
+def _elapsed_ms(start: float) -> float:
+    """Milliseconds since a time.perf_counter() reading."""
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def update_all_investment_prices(
+    incremental: bool = False,
+    min_age_minutes: int = PRICE_UPDATE_MIN_AGE_MINUTES,
+    user_id: Optional[int] = None,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None
+):
     """
     Update current_value and last_price for all investments in the database.
     This function is designed to be called by the scheduler at 1 AM.
+    With user_id, only that user's holdings (and history snapshot) are updated.
+    progress, if given, is called with each phase name and the counts so far.
+    
+    All new prices are written by one UPDATE ... FROM (VALUES ...) joined on the
+    (upper-cased at write time) symbol index, and history rows by one upsert.
+    Rows whose price did not change are never rewritten; the time each symbol got
+    a price is kept in symbol_price_checks instead. In incremental mode, symbols
+    checked less than min_age_minutes ago are not fetched at all, unless one of
+    their holdings was never priced.
+    
+    Returns:
+        Dict with updated (investment rows written), failed (symbols without a
+        price), symbols, users, skipped_fresh (symbols not fetched),
+        skipped_unchanged (rows whose price did not move), fetch stats and
+        timings (elapsed ms per phase)
     """
     from database import get_db_connection
+    from psycopg2.extras import execute_values
+    from services.dashboard_service import bump_data_versions
+    from services.portfolio_summary import refresh_portfolio_summaries
     
     print(f"\n{'='*50}")
     print(f"🕐 Starting price update at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*50}\n")
     
+    timings = {}
     conn = get_db_connection()
     cur = conn.cursor()
+    # Restricts every statement below to one user's rows
+    user_filter = cur.mogrify(" AND user_id = %s", (user_id,)).decode() if user_id is not None else ""
+    
+    def report(phase: str, **counts):
+        if progress:
+            progress(phase, {"timings": dict(timings), **counts})
     
-    # Get all unique symbols from investments
-    cur.execute("SELECT DISTINCT symbol FROM investments")
-    symbols = [row['symbol'] for row in cur.fetchall()]
+    # Get all unique symbols from investments, and whether each is due for a new price
+    start = time.perf_counter()
+    report("load_symbols")
+    cur.execute(f"""
+        SELECT i.symbol,
+               BOOL_OR(i.last_price_at IS NULL)
+               OR COALESCE(MAX(c.checked_at) < NOW() - %s * INTERVAL '1 minute', TRUE) AS due
+        FROM investments i
+        LEFT JOIN symbol_price_checks c ON c.symbol = i.symbol
+        WHERE TRUE{user_filter}
+        GROUP BY i.symbol
+    """, (min_age_minutes if incremental else 0,))
+    rows = cur.fetchall()
+    symbols = [row['symbol'] for row in rows if row['due'] or not incremental]
+    skipped_fresh = len(rows) - len(symbols)
+    timings["load_symbols"] = _elapsed_ms(start)
     
-    if not symbols:
+    if not rows:
         print("No investments found to update.")
         cur.close()
         conn.close()
-        return {"updated": 0, "failed": 0}
+        return {
+            "updated": 0, "failed": 0, "symbols": 0, "users": 0,
+            "skipped_fresh": 0, "skipped_unchanged": 0, "timings": timings
+        }
     
-    print(f"📊 Found {len(symbols)} unique symbols to update")
+    print(f"📊 Found {len(symbols)} unique symbols to update ({skipped_fresh} skipped as fresh)")
     
-    # Fetch all prices
-    price_service = PriceService()
-    prices = price_service.fetch_prices_batch(symbols)
+    # Fetch all prices (the daily history snapshot below is recorded even if none are due)
+    start = time.perf_counter()
+    report("fetch_prices", symbols=len(symbols), skipped_fresh=skipped_fresh)
+    fetch_stats = {}
+    prices = get_price_service().fetch_prices_batch(symbols, fetch_stats) if symbols else {}
+    timings["fetch_prices"] = _elapsed_ms(start)
+    if fetch_stats.get("shards"):
+        print(
+            f"🌐 Fetched {len(symbols) - fetch_stats['cache_hits']} symbols in {fetch_stats['shards']} shards "
+            f"({fetch_stats['retries']} retries, {fetch_stats['failed_shards']} shards with failures)"
+        )
     
-    updated_count = 0
-    failed_count = 0
+    new_prices = [
+        (symbol.upper(), price_data['price'])
+        for symbol, price_data in prices.items()
+        if price_data and price_data.get('price')
+    ]
+    failed_count = len(symbols) - len(new_prices)
+    if failed_count:
+        missing = sorted(set(s.upper() for s in symbols) - set(symbol for symbol, _ in new_prices))
+        print(f"⚠️ No price data for {failed_count} symbols: {', '.join(missing[:20])}")
     
-    # Update each investment
-    for symbol, price_data in prices.items():
-        if price_data and price_data.get('price'):
-            try:
-                # Update all investments with this symbol
-                cur.execute("""
-                    UPDATE investments
-                    SET last_price = %s,
-                        current_value = units * %s,
-                        last_price_at = NOW()
-                    WHERE UPPER(symbol) = %s
-                """, (price_data['price'], price_data['price'], symbol.upper()))
-                
-                rows_affected = cur.rowcount
-                updated_count += rows_affected
-                print(f"✅ Updated {symbol}: ${price_data['price']} ({rows_affected} investments)")
-                
-            except Exception as e:
-                print(f"❌ Error updating {symbol}: {e}")
-                failed_count += 1
-        else:
-            print(f"⚠️ No price data for {symbol}")
-            failed_count += 1
+    # Write every changed price in one statement (unchanged rows are left alone)
+    start = time.perf_counter()
+    report("update_investments", symbols=len(symbols), skipped_fresh=skipped_fresh, failed=failed_count)
+    touched = []
+    matched = 0
+    if new_prices:
+        cur.execute(
+            f"SELECT COUNT(*) AS matched FROM investments WHERE symbol = ANY(%s){user_filter}",
+            ([symbol for symbol, _ in new_prices],)
+        )
+        matched = cur.fetchone()['matched']
+        touched = execute_values(cur, f"""
+            UPDATE investments i
+            SET last_price = v.price,
+                current_value = i.units * v.price,
+                last_price_at = NOW()
+            FROM (VALUES %s) AS v(symbol, price)
+            WHERE i.symbol = v.symbol
+              AND i.last_price IS DISTINCT FROM v.price{user_filter}  -- v has no user_id, so this filters i
+            RETURNING i.user_id
+        """, new_prices, template="(%s, %s::numeric)", page_size=len(new_prices), fetch=True)
+        execute_values(cur, """
+            INSERT INTO symbol_price_checks (symbol, checked_at)
+            VALUES %s
+            ON CONFLICT (symbol) DO UPDATE SET checked_at = EXCLUDED.checked_at
+        """, [(symbol,) for symbol, _ in new_prices], template="(%s, NOW())", page_size=1000)
+    updated_count = len(touched)
+    skipped_unchanged = matched - updated_count
+    user_ids = sorted(set(row['user_id'] for row in touched))
+    timings["update_investments"] = _elapsed_ms(start)
+    print(f"✅ Updated {updated_count} investments across {len(new_prices)} symbols ({skipped_unchanged} unchanged)")
     
+    start = time.perf_counter()
+    report("refresh_summaries", updated=updated_count, users=len(user_ids))
+    # Holders without a rollup row yet (never read, or wiped by a reseed) get one
+    # too, so the history snapshot below covers every holder and not only the
+    # users whose prices moved
+    cur.execute(f"""
+        SELECT DISTINCT user_id
+        FROM investments i
+        WHERE NOT EXISTS (SELECT 1 FROM user_portfolio_summary s WHERE s.user_id = i.user_id){user_filter}
+    """)
+    missing_summaries = [row['user_id'] for row in cur.fetchall()]
+    refresh_portfolio_summaries(cur, set(user_ids) | set(missing_summaries))
+    bump_data_versions(cur, user_ids, "investments")
     conn.commit()
+    timings["refresh_summaries"] = _elapsed_ms(start)
     
     # ---------------------------------------------------------
     # RECORD PORTFOLIO HISTORY SNAPSHOT
     # ---------------------------------------------------------
+    start = time.perf_counter()
+    report("record_history", updated=updated_count, users=len(user_ids))
     try:
-        # Calculate total value and invested amount for each user
-        cur.execute("""
-            SELECT 
-                user_id, 
-                SUM(current_value) as total_value, 
-                SUM(cost_basis) as total_invested
-            FROM investments
-            GROUP BY user_id
+        # Total value and invested amount for each user (from the rollup refreshed above)
+        cur.execute(f"""
+            SELECT user_id, total_value, total_invested
+            FROM user_portfolio_summary
+            WHERE total_investments > 0{user_filter}
         """)
         user_portfolios = cur.fetchall()
         
         today = datetime.now().date()
         
-        for portfolio in user_portfolios:
-            user_id = portfolio['user_id']
-            total_value = portfolio['total_value']
-            total_invested = portfolio['total_invested']
-            
-            # Insert or Update history for today
-            cur.execute("""
-                INSERT INTO portfolio_history (user_id, date, total_value, total_invested)
-                VALUES (%s, %s, %s, %s)
+        # New history rows are stamped with each user's data version for delta sync
+        data_versions = bump_data_versions(cur, [p['user_id'] for p in user_portfolios], "history")
+        
+        # Insert or Update history for today
+        if user_portfolios:
+            execute_values(cur, """
+                INSERT INTO portfolio_history (user_id, date, total_value, total_invested, data_version)
+                VALUES %s
                 ON CONFLICT (user_id, date) 
                 DO UPDATE SET 
                     total_value = EXCLUDED.total_value,
                     total_invested = EXCLUDED.total_invested,
+                    data_version = EXCLUDED.data_version,
                     created_at = NOW()
-            """, (user_id, today, total_value, total_invested))
+            """, [
+                (p['user_id'], today, p['total_value'], p['total_invested'], data_versions[p['user_id']])
+                for p in user_portfolios
+            ], page_size=1000)
             
         print(f"📈 Recorded portfolio history for {len(user_portfolios)} users")
         conn.commit()
@@ -319,24 +741,41 @@ def update_all_investment_prices():
     except Exception as e:
         print(f"❌ Error recording portfolio history: {e}")
         conn.rollback()
+    timings["record_history"] = _elapsed_ms(start)
     
     cur.close()
     conn.close()
     
     print(f"\n{'='*50}")
     print(f"✅ Price update complete: {updated_count} updated, {failed_count} failed")
+    print(f"⏱️ Phases (ms): {timings}")
     print(f"{'='*50}\n")
     
-    return {"updated": updated_count, "failed": failed_count}
+    return {
+        "updated": updated_count,
+        "failed": failed_count,
+        "symbols": len(new_prices),
+        "users": len(user_ids),
+        "skipped_fresh": skipped_fresh,
+        "skipped_unchanged": skipped_unchanged,
+        "fetch": {key: value for key, value in fetch_stats.items() if key != "failed_symbols"},
+        "timings": timings
+    }
 
 
 # Singleton instance
 _price_service: Optional[PriceService] = None
+_price_service_lock = threading.Lock()
 
 
 def get_price_service() -> PriceService:
-    """Get or create the price service singleton."""
+    """
+    Get or create the price service singleton (cheap: Redis connections come
+    from the process-wide pool set up by init_redis_pool).
+    """
     global _price_service
     if _price_service is None:
-        _price_service = PriceService()
+        with _price_service_lock:
+            if _price_service is None:
+                _price_service = PriceService()
     return _price_service
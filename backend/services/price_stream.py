@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, Optional, Set
+from dotenv import load_dotenv
+from services.price_service import PRICE_UPDATES_CHANNEL
+from services.redis_pool import REDIS_URL, REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD
+
+load_dotenv()
+
+# Frames buffered per client; a client that falls this far behind loses its oldest frames
+PRICE_STREAM_QUEUE_SIZE = int(os.getenv("PRICE_STREAM_QUEUE_SIZE", 256))
+# Seconds between keep-alive comments on an idle stream
+PRICE_STREAM_HEARTBEAT = int(os.getenv("PRICE_STREAM_HEARTBEAT", 15))
+# Seconds between reconnect attempts while Redis is unreachable
+PRICE_STREAM_RECONNECT_DELAY = 5
+
+
+def price_event(price_data: Dict) -> bytes:
+    """One Server-Sent Events frame carrying a price update."""
+    return f"event: price\ndata: {json.dumps(price_data)}\n\n".encode("utf-8")
+
+
+class _ClientQueue(asyncio.Queue):
+    """Frame queue of one connected client, with the symbols it follows."""
+
+    def __init__(self, symbols: Set[str], maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.symbols = symbols
+
+
+class PriceStreamHub:
+    """
+    Per-process fan-out of live prices.
+
+    One Redis pub/sub subscription per API process listens on
+    PRICE_UPDATES_CHANNEL (published by PriceService.set_prices_in_cache).
+    Each update is decoded, checked against the last price seen for the symbol
+    (unchanged prices are dropped, so clients only get deltas) and encoded into
+    an SSE frame once; the same frame is then handed to the queue of every
+    client holding that symbol. Redis and JSON work per message therefore does
+    not grow with the number of connected clients.
+    """
+
+    def __init__(self, queue_size: int = PRICE_STREAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[_ClientQueue]] = {}
+        self._last_prices: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.messages = 0
+        self.frames = 0
+        self.dropped = 0
+
+    async def start(self):
+        """Start listening in the background (reconnects on its own)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def subscribe(self, symbols: Iterable[str]) -> _ClientQueue:
+        """Register a client for the given symbols; frames arrive on the returned queue."""
+        queue = _ClientQueue({symbol.upper() for symbol in symbols}, self.queue_size)
+        for symbol in queue.symbols:
+            self._subscribers.setdefault(symbol, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: _ClientQueue):
+        for symbol in queue.symbols:
+            subscribers = self._subscribers.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[symbol]
+
+    def stats(self) -> Dict:
+        return {
+            "clients": len({id(queue) for queues in self._subscribers.values() for queue in queues}),
+            "symbols": len(self._subscribers),
+            "messages": self.messages,
+            "frames": self.frames,
+            "dropped": self.dropped
+        }
+
+    def publish_local(self, updates: Iterable[Dict]):
+        """Fan a batch of price updates out to this process's clients."""
+        self.messages += 1
+        for price_data in updates:
+            symbol = str(price_data.get("symbol", "")).upper()
+            price = price_data.get("price")
+            if price is None or self._last_prices.get(symbol) == price:
+                continue
+            self._last_prices[symbol] = price
+            subscribers = self._subscribers.get(symbol)
+            if not subscribers:
+                continue
+
+            frame = price_event(price_data)
+            self.frames += 1
+            for queue in subscribers:
+                if queue.full():
+                    # Slow client: the newest price matters more than the oldest
+                    queue.get_nowait()
+                    self.dropped += 1
+                queue.put_nowait(frame)
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            client = None
+            try:
+                if REDIS_URL:
+                    client = aioredis.from_url(REDIS_URL)
+                else:
+                    client = aioredis.Redis(
+                        host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD
+                    )
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(PRICE_UPDATES_CHANNEL)
+                print(f"📡 Listening for price updates on {PRICE_UPDATES_CHANNEL}")
+                async for message in pubsub.listen():
+                    try:
+                        self.publish_local(json.loads(message["data"]))
+                    except (TypeError, ValueError) as e:
+                        print(f"⚠️ Ignoring malformed price update: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Price stream subscription lost: {e}. Retrying in {PRICE_STREAM_RECONNECT_DELAY}s")
+                await asyncio.sleep(PRICE_STREAM_RECONNECT_DELAY)
+            finally:
+                if client is not None:
+                    await client.aclose()
+
+
+# One hub per API process, started in the app lifespan
+price_stream_hub = PriceStreamHub()
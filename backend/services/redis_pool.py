@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Redis configuration
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+
+# Connections per pool (one text and one binary pool per process)
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+# Connect / command timeouts (seconds): a dead Redis costs at most this per call
+# until the circuit breaker opens
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 0.5))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 1.0))
+# Circuit breaker: consecutive failures that open it, and seconds before a trial call
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", 3))
+REDIS_BREAKER_RESET = float(os.getenv("REDIS_BREAKER_RESET", 30))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls go through. After `threshold` failures in a row it opens and
+    callers skip Redis entirely (allow() is False) for `reset_timeout` seconds.
+    Then a single trial call is let through (half-open): success closes the
+    breaker, failure opens it for another reset_timeout.
+    """
+
+    def __init__(self, threshold: int = REDIS_BREAKER_THRESHOLD, reset_timeout: float = REDIS_BREAKER_RESET):
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._trial_at is not None else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # One trial at a time; a trial whose outcome was never recorded expires too
+            if self._trial_at is not None and now - self._trial_at < self.reset_timeout:
+                return False
+            self._trial_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_at is not None or self._failures >= self.threshold:
+                self._open()
+
+    def trip(self):
+        """Open immediately (e.g. Redis was unreachable at startup)."""
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self._opened_at is None or self._trial_at is not None:
+            self.trips += 1
+        self._opened_at = time.monotonic()
+        self._trial_at = None
+
+    def stats(self) -> Dict:
+        return {"state": self.state, "consecutive_failures": self._failures, "trips": self.trips}
+
+
+redis_breaker = CircuitBreaker()
+
+_pools: Dict[bool, redis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _new_pool(decode_responses: bool) -> redis.ConnectionPool:
+    options = dict(
+        max_connections=REDIS_MAX_CONNECTIONS,
+        decode_responses=decode_responses,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30
+    )
+    if REDIS_URL:
+        return redis.ConnectionPool.from_url(REDIS_URL, **options)
+    return redis.ConnectionPool(
+        host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, password=REDIS_PASSWORD, **options
+    )
+
+
+def _get_pool(decode_responses: bool) -> redis.ConnectionPool:
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(decode_responses)
+            if pool is None:
+                pool = _pools[decode_responses] = _new_pool(decode_responses)
+    return pool
+
+
+def init_redis_pool():
+    """
+    Create this process's Redis pools and check the server once, so no request
+    pays for connecting. An unreachable server opens the circuit breaker.
+    Called from the FastAPI lifespan and Celery worker process init.
+    """
+    client = redis.Redis(connection_pool=_get_pool(True))
+    _get_pool(False)
+    try:
+        client.ping()
+        redis_breaker.record_success()
+        print("✅ Redis connected successfully")
+    except redis.RedisError as e:
+        redis_breaker.trip()
+        print(f"⚠️ Redis connection failed: {e}. Falling back to direct API calls.")
+
+
+def close_redis_pool():
+    """Disconnect every pooled connection of this process."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.disconnect()
+        _pools.clear()
+
+
+def get_redis_client(decode_responses: bool = True) -> Optional[redis.Redis]:
+    """
+    Client on the shared pool (decode_responses=False for binary values), or
+    None while the circuit breaker is open. Callers report the outcome of their
+    calls with redis_breaker.record_success() / record_failure().
+    """
+    if not redis_breaker.allow():
+        return None
+    return redis.Redis(connection_pool=_get_pool(decode_responses))
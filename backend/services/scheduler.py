@@ -1,5 +1,7 @@
 from celery_app import celery_app
 from datetime import datetime
+from typing import Optional
+from uuid import uuid4
 
 @celery_app.task(name="daily_price_update")
 def price_update_task():
@@ -9,13 +11,90 @@ def price_update_task():
     
     try:
         from services.price_service import update_all_investment_prices
-        result = update_all_investment_prices()
+        # Symbols already repriced by an earlier run or refresh job are skipped
+        result = update_all_investment_prices(incremental=True)
         print(f"[INFO] 📈 Price update result: {result}")
         return result
     except Exception as e:
         print(f"[ERROR] ❌ Price update failed: {e}")
         raise e
 
+@celery_app.task(name="compact_portfolio_history")
+def compact_history_task():
+    """Celery task to roll daily portfolio history into weekly/monthly tiers."""
+    print(f"[INFO] 🗜️ Celery task: History compaction triggered at {datetime.now()}")
+    
+    try:
+        from services.history_service import compact_portfolio_history
+        result = compact_portfolio_history()
+        print(f"[INFO] 📈 History compaction result: {result}")
+        return result
+    except Exception as e:
+        print(f"[ERROR] ❌ History compaction failed: {e}")
+        raise e
+
+@celery_app.task(name="precompute_goal_progress")
+def goal_progress_task():
+    """Celery task to precompute progress for every active goal."""
+    print(f"[INFO] 🎯 Celery task: Goal progress precompute triggered at {datetime.now()}")
+    
+    try:
+        from services.goal_progress import precompute_all_goal_progress
+        result = precompute_all_goal_progress()
+        print(f"[INFO] 🎯 Goal progress result: {result}")
+        return result
+    except Exception as e:
+        print(f"[ERROR] ❌ Goal progress precompute failed: {e}")
+        raise e
+
+@celery_app.task(name="ingest_price_history")
+def price_history_task():
+    """Celery task to backfill daily OHLC bars into price_history."""
+    print(f"[INFO] 🕯️ Celery task: Price history ingestion triggered at {datetime.now()}")
+    
+    try:
+        from services.price_history_service import ingest_price_history
+        result = ingest_price_history()
+        print(f"[INFO] 🕯️ Price history result: {result}")
+        return result
+    except Exception as e:
+        print(f"[ERROR] ❌ Price history ingestion failed: {e}")
+        raise e
+
+# Job ids of user refreshes carry the owner, so status lookups can be scoped to the caller
+REFRESH_JOB_PREFIX = "refresh-prices"
+
+
+def refresh_job_id(user_id: int) -> str:
+    """New job id for a user-scoped price refresh."""
+    return f"{REFRESH_JOB_PREFIX}-{user_id}-{uuid4().hex}"
+
+
+def refresh_job_owner(job_id: str) -> Optional[int]:
+    """User id encoded in a refresh job id, or None if it is not one."""
+    prefix, _, rest = job_id.partition(f"{REFRESH_JOB_PREFIX}-")
+    user_id, _, token = rest.partition("-")
+    if prefix or not user_id.isdigit() or not token:
+        return None
+    return int(user_id)
+
+@celery_app.task(bind=True, name="refresh_user_prices")
+def refresh_user_prices_task(self, user_id: int):
+    """Celery task to refetch the prices of one user's holdings, reporting progress."""
+    print(f"[INFO] 🔄 Celery task: Price refresh for user {user_id} triggered at {datetime.now()}")
+    
+    def progress(phase, counts):
+        self.update_state(state="PROGRESS", meta={"user_id": user_id, "phase": phase, **counts})
+    
+    try:
+        from services.price_service import update_all_investment_prices
+        result = update_all_investment_prices(incremental=False, user_id=user_id, progress=progress)
+        print(f"[INFO] 📈 Price refresh result for user {user_id}: {result}")
+        return {"user_id": user_id, **result}
+    except Exception as e:
+        print(f"[ERROR] ❌ Price refresh for user {user_id} failed: {e}")
+        raise e
+
 def trigger_price_update_now():
     """
     Manually trigger the price update job immediately.
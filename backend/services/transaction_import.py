@@ -0,0 +1,356 @@
+import codecs
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from schema import TransactionImport
+
+# Rows accepted per import
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", 50000))
+# Rows per COPY call; a progress frame is sent after each
+IMPORT_COPY_CHUNK = int(os.getenv("IMPORT_COPY_CHUNK", 5000))
+# Row errors listed in a rejection (the rest are only counted)
+IMPORT_MAX_ERRORS = 20
+# Width of the symbol columns
+SYMBOL_MAX_LENGTH = 20
+
+TRANSACTION_COPY_COLUMNS = ("user_id", "symbol", "type", "quantity", "price", "fees", "executed_at", "data_version")
+
+
+class ImportRejected(ValueError):
+    """The import cannot be applied; `errors` lists offending rows as {"line", "error"}."""
+
+    def __init__(self, message: str, errors: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def _copy_text(value: Any) -> str:
+    """A value in COPY text format."""
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _decimal(value: float) -> Decimal:
+    return Decimal(str(value))
+
+
+def _frame(data: Dict[str, Any]) -> bytes:
+    return (json.dumps(data, default=str) + "\n").encode("utf-8")
+
+
+class TransactionImporter:
+    """
+    Bulk import of one user's historical transactions.
+
+    feed() parses the request body chunk by chunk as it arrives - CSV with a
+    header row (quoted fields may span lines), or NDJSON, one record per line -
+    validating every row with TransactionImport. plan() reserves the user's
+    next data version and locks the user's positions in the imported
+    symbols and folds all buys and sells into them in executed_at order (file
+    order for ties), rejecting sells of units not held, exactly like
+    POST /transactions would one by one. write() then COPYs the transactions,
+    writes one net position per symbol and commits once, yielding NDJSON
+    progress frames along the way.
+    """
+
+    def __init__(self, user_id: int, fmt: str = "ndjson"):
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported import format: {fmt}")
+        self.user_id = user_id
+        self.fmt = fmt
+        self.rows: List[Tuple[int, TransactionImport]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self.invalid_rows = 0
+        self.line_number = 0
+        self.timings: Dict[str, float] = {}
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._pending = ""
+        self._header: Optional[List[str]] = None
+        # Lines of a CSV record whose quoted field spans lines, and their quote count
+        self._record: List[str] = []
+        self._record_quotes = 0
+        self._record_line = 0
+        self._started = time.perf_counter()
+        self._transactions: List[Tuple[datetime, TransactionImport]] = []
+        self._positions: Dict[str, Dict[str, Any]] = {}
+        self._data_version: Optional[int] = None
+
+    # ---------- parsing ----------
+
+    def feed(self, chunk: bytes):
+        """Parse every complete record of the next body chunk."""
+        text = self._pending + self._decoder.decode(chunk)
+        lines = text.split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._take_line(line)
+
+    def finish(self):
+        """Parse the last record. Raises ImportRejected if any row was invalid."""
+        tail = self._pending + self._decoder.decode(b"", final=True)
+        self._pending = ""
+        if tail:
+            self._take_line(tail)
+        if self._record:
+            # Unterminated quoted field: let the CSV reader have the rest
+            self._parse_line("\n".join(self._record), self._record_line)
+            self._record = []
+        self.timings["parse"] = round((time.perf_counter() - self._started) * 1000, 2)
+
+        if self.invalid_rows:
+            raise ImportRejected(f"{self.invalid_rows} invalid rows, nothing was imported", self.errors)
+        if not self.rows:
+            raise ImportRejected("No transactions to import")
+
+    def _reject_row(self, line_number: int, error: str):
+        self.invalid_rows += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line_number, "error": error})
+
+    def _take_line(self, line: str):
+        """
+        Collect one physical line. A CSV record continues over the next lines
+        while one of its quoted fields is open (an odd number of quotes so far,
+        escaped quotes being doubled); errors point at its first line.
+        """
+        self.line_number += 1
+        line = line.rstrip("\r")
+        if self.fmt != "csv":
+            self._parse_line(line, self.line_number)
+            return
+
+        if not self._record:
+            self._record_line = self.line_number
+        self._record.append(line)
+        self._record_quotes += line.count('"')
+        if self._record_quotes % 2:
+            return
+        record = "\n".join(self._record)
+        self._record = []
+        self._record_quotes = 0
+        self._parse_line(record, self._record_line)
+
+    def _parse_line(self, line: str, line_number: int):
+        if not line.strip():
+            return
+
+        try:
+            if self.fmt == "csv":
+                values = next(csv.reader([line]))
+                if self._header is None:
+                    self._header = [value.strip().lower() for value in values]
+                    return
+                # Blank cells fall back to the schema defaults
+                record = {
+                    column: value.strip()
+                    for column, value in zip(self._header, values)
+                    if value.strip()
+                }
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            row = TransactionImport.model_validate(record)
+        except ValidationError as e:
+            self._reject_row(line_number, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}" for error in e.errors()
+            ))
+            return
+        except (ValueError, csv.Error) as e:
+            self._reject_row(line_number, str(e))
+            return
+
+        if len(row.symbol) > SYMBOL_MAX_LENGTH:
+            self._reject_row(line_number, f"symbol: at most {SYMBOL_MAX_LENGTH} characters")
+            return
+        if len(self.rows) >= IMPORT_MAX_ROWS:
+            raise ImportRejected(f"Imports are limited to {IMPORT_MAX_ROWS} rows")
+        self.rows.append((line_number, row))
+
+    # ---------- folding ----------
+
+    def plan(self, cur):
+        """
+        Fold the trades into the user's current positions, locking them
+        (SELECT ... FOR UPDATE) until write() commits.
+        Raises ImportRejected listing the sells that exceed the units held.
+        """
+        from services.dashboard_service import bump_data_version
+
+        start = time.perf_counter()
+        # Taken first: the version row lock serializes this import with the
+        # user's other writes, so a trade that opens a new position cannot land
+        # between the positions read below and write()'s upsert.
+        # New rows are stamped with this version for delta sync.
+        self._data_version = bump_data_version(cur, self.user_id, "transactions", "investments")
+        cur.execute("SELECT LOCALTIMESTAMP AS now")
+        now = cur.fetchone()["now"]
+
+        trades = []
+        for line, row in self.rows:
+            executed_at = row.executed_at or now
+            if executed_at.tzinfo is not None:
+                executed_at = executed_at.astimezone(timezone.utc).replace(tzinfo=None)
+            trades.append((executed_at, line, row))
+        trades.sort(key=lambda trade: (trade[0], trade[1]))
+
+        cur.execute("""
+            SELECT id, symbol, asset_type, units, cost_basis, avg_buy_price, last_price, last_price_at
+            FROM investments
+            WHERE user_id = %s AND symbol = ANY(%s)
+            ORDER BY symbol
+            FOR UPDATE
+        """, (self.user_id, sorted({row.symbol for _, row in self.rows})))
+        positions = {row["symbol"]: dict(row) for row in cur.fetchall()}
+
+        errors = []
+        last_trade_prices = {}
+        for executed_at, line, row in trades:
+            if row.type.value not in ("buy", "sell"):
+                continue
+            quantity, price = _decimal(row.quantity), _decimal(row.price)
+            position = positions.get(row.symbol)
+
+            if row.type.value == "buy":
+                total_cost = quantity * price + _decimal(row.fees)
+                if position is None or not position["units"]:
+                    position = positions[row.symbol] = {
+                        "id": position["id"] if position else None,
+                        "symbol": row.symbol,
+                        "asset_type": row.asset_type.value,
+                        "units": quantity,
+                        "cost_basis": total_cost,
+                        "avg_buy_price": price,
+                        "last_price": position["last_price"] if position else None,
+                        "last_price_at": position["last_price_at"] if position else None
+                    }
+                else:
+                    position["units"] += quantity
+                    position["cost_basis"] += total_cost
+                    position["avg_buy_price"] = position["cost_basis"] / position["units"]
+            else:
+                if position is None or not position["units"]:
+                    errors.append({"line": line, "error": f"You don't own any {row.symbol} to sell"})
+                    continue
+                if position["units"] < quantity:
+                    errors.append({"line": line, "error": f"Insufficient units of {row.symbol} to sell"})
+                    continue
+                # Proportional cost basis reduction
+                position["cost_basis"] -= quantity / position["units"] * position["cost_basis"]
+                position["units"] -= quantity
+            last_trade_prices[row.symbol] = price
+
+        if errors:
+            raise ImportRejected(f"{len(errors)} sells exceed the units held, nothing was imported", errors[:IMPORT_MAX_ERRORS])
+
+        # Held positions keep their market price: imported history is usually
+        # older than it. Positions without one are valued at their last trade,
+        # with no last_price_at so the next price update fetches a real quote.
+        for symbol, price in last_trade_prices.items():
+            if positions[symbol]["last_price"] is None:
+                positions[symbol]["last_price"] = price
+                positions[symbol]["last_price_at"] = None
+
+        self._transactions = [(executed_at, row) for executed_at, _, row in trades]
+        self._positions = {symbol: positions[symbol] for symbol in last_trade_prices}
+        self.timings["plan"] = round((time.perf_counter() - start) * 1000, 2)
+
+    # ---------- writing ----------
+
+    def _copy_transactions(self, cur, transactions, data_version: int):
+        buffer = io.StringIO()
+        for executed_at, row in transactions:
+            buffer.write("\t".join(_copy_text(value) for value in (
+                self.user_id, row.symbol, row.type.value, _decimal(row.quantity),
+                _decimal(row.price), _decimal(row.fees), executed_at.isoformat(sep=" "), data_version
+            )))
+            buffer.write("\n")
+        buffer.seek(0)
+        cur.copy_expert(f"COPY transactions ({', '.join(TRANSACTION_COPY_COLUMNS)}) FROM STDIN", buffer)
+
+    def _write_positions(self, cur) -> Dict[str, int]:
+        """One upsert for every open position and one DELETE for closed ones."""
+        from psycopg2.extras import execute_values
+
+        open_positions = [position for position in self._positions.values() if position["units"] > 0]
+        closed_ids = [
+            position["id"] for position in self._positions.values()
+            if position["units"] <= 0 and position["id"] is not None
+        ]
+        if open_positions:
+            execute_values(cur, """
+                INSERT INTO investments
+                (user_id, asset_type, symbol, units, avg_buy_price, cost_basis, current_value, last_price, last_price_at)
+                VALUES %s
+                ON CONFLICT (user_id, symbol)
+                DO UPDATE SET
+                    units = EXCLUDED.units,
+                    avg_buy_price = EXCLUDED.avg_buy_price,
+                    cost_basis = EXCLUDED.cost_basis,
+                    current_value = EXCLUDED.current_value,
+                    last_price = EXCLUDED.last_price,
+                    last_price_at = EXCLUDED.last_price_at
+            """, [
+                (
+                    self.user_id, position["asset_type"], position["symbol"], position["units"],
+                    position["avg_buy_price"], position["cost_basis"],
+                    position["units"] * position["last_price"], position["last_price"], position["last_price_at"]
+                )
+                for position in open_positions
+            ], page_size=1000)
+        if closed_ids:
+            cur.execute("DELETE FROM investments WHERE id = ANY(%s)", (closed_ids,))
+        return {"positions": len(open_positions), "positions_closed": len(closed_ids)}
+
+    def write(self, conn, cur) -> Iterator[bytes]:
+        """
+        Write the planned import on plan()'s connection and commit once, yielding
+        NDJSON progress frames, then a final {"status": "done" | "error"} frame.
+        The connection is closed at the end; if the client goes away before
+        that, nothing is committed.
+        """
+        from services.portfolio_summary import refresh_portfolio_summaries
+
+        committed = False
+        try:
+            start = time.perf_counter()
+            data_version = self._data_version
+            total = len(self._transactions)
+            for i in range(0, total, IMPORT_COPY_CHUNK):
+                self._copy_transactions(cur, self._transactions[i:i + IMPORT_COPY_CHUNK], data_version)
+                yield _frame({"phase": "transactions", "written": min(i + IMPORT_COPY_CHUNK, total), "total": total})
+            self.timings["copy_transactions"] = round((time.perf_counter() - start) * 1000, 2)
+
+            start = time.perf_counter()
+            position_counts = self._write_positions(cur)
+            refresh_portfolio_summaries(cur, [self.user_id])
+            self.timings["write_positions"] = round((time.perf_counter() - start) * 1000, 2)
+            yield _frame({"phase": "positions", "symbols": len(self._positions), **position_counts})
+
+            start = time.perf_counter()
+            conn.commit()
+            committed = True
+            self.timings["commit"] = round((time.perf_counter() - start) * 1000, 2)
+            print(f"📥 Imported {total} transactions for user {self.user_id}: {self.timings}")
+            yield _frame({
+                "status": "done",
+                "imported": total,
+                "symbols": len(self._positions),
+                **position_counts,
+                "timings": self.timings
+            })
+        except Exception as e:
+            print(f"❌ Transaction import failed for user {self.user_id}: {e}")
+            yield _frame({"status": "error", "error": str(e)})
+        finally:
+            if not committed:
+                conn.rollback()
+            cur.close()
+            conn.close()
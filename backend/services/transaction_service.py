@@ -0,0 +1,212 @@
+import base64
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+# Page size of the transactions embedded in /dashboard/aggregate
+AGGREGATE_TRANSACTIONS_PAGE = 50
+
+
+def encode_cursor(executed_at: datetime, transaction_id: int) -> str:
+    """Encode the (executed_at, id) keyset position of the last row of a page."""
+    raw = f"{executed_at.isoformat()}|{transaction_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        executed_at, transaction_id = raw.split("|")
+        return datetime.fromisoformat(executed_at), int(transaction_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def build_transactions_page_query(
+    user_id: int,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    symbol: Optional[str] = None,
+    tx_type: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Tuple[str, list]:
+    """
+    Build the keyset-paginated transactions query (see load_transactions_page).
+    Raises ValueError on a malformed cursor.
+
+    Returns:
+        (query, params) with psycopg2 placeholders
+    """
+    conditions = ["user_id = %s"]
+    params = [user_id]
+
+    if symbol:
+        conditions.append("symbol = %s")
+        params.append(symbol)
+    if tx_type:
+        conditions.append("type = %s")
+        params.append(tx_type)
+    if start_date:
+        conditions.append("executed_at >= %s")
+        params.append(datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        # end_date is inclusive
+        conditions.append("executed_at < %s")
+        params.append(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+    if cursor:
+        executed_at, transaction_id = decode_cursor(cursor)
+        conditions.append("(executed_at, id) < (%s, %s)")
+        params.extend([executed_at, transaction_id])
+
+    query = f"""
+        SELECT id, symbol, type, quantity, price, fees, executed_at
+        FROM transactions
+        WHERE {" AND ".join(conditions)}
+        ORDER BY executed_at DESC, id DESC
+    """
+    if limit:
+        # One extra row tells us whether another page exists
+        query += " LIMIT %s"
+        params.append(limit + 1)
+
+    return query, params
+
+
+def paginate_rows(rows: List[Dict[str, Any]], limit: Optional[int]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the extra look-ahead row and derive the next page's cursor."""
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1]["executed_at"], rows[-1]["id"])
+    return rows, None
+
+
+def load_transactions_page(cur, user_id: int, limit: Optional[int] = None, **filters) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Load one page of the user's transactions, newest first.
+
+    Keyset pagination on (executed_at, id) served by the
+    (user_id, executed_at DESC, id DESC) index, so every page costs the same
+    no matter how deep the client has scrolled. Without a limit the whole
+    (filtered) history is returned.
+    Filters: cursor, symbol, tx_type, start_date, end_date (inclusive).
+
+    Returns:
+        (rows, next_cursor) - next_cursor is None on the last page
+    """
+    query, params = build_transactions_page_query(user_id, limit, **filters)
+    cur.execute(query, params)
+    return paginate_rows(cur.fetchall(), limit)
+
+
+# Every write returns the new transaction row in the same shape
+_TRANSACTION_RETURNING = "RETURNING id, symbol, type, quantity, price, fees, executed_at"
+
+# Non-trade transaction (dividend, contribution, withdrawal): no position change
+RECORD_TRANSACTION_QUERY = f"""
+    INSERT INTO transactions
+    (user_id, symbol, type, quantity, price, fees, executed_at, data_version)
+    VALUES (%(user_id)s, %(symbol)s, %(type)s, %(quantity)s, %(price)s, %(fees)s, NOW(), %(data_version)s)
+    {_TRANSACTION_RETURNING}
+"""
+
+# Buy: upsert the position with the weighted average cost computed from the
+# locked row, and record the transaction - one statement
+BUY_TRANSACTION_QUERY = f"""
+    WITH position AS (
+        INSERT INTO investments AS i
+        (user_id, asset_type, symbol, units, avg_buy_price, cost_basis, current_value, last_price, last_price_at)
+        VALUES (
+            %(user_id)s, %(asset_type)s, %(symbol)s, %(quantity)s::numeric, %(price)s::numeric,
+            %(quantity)s::numeric * %(price)s::numeric + %(fees)s::numeric,
+            %(quantity)s::numeric * %(price)s::numeric, %(price)s::numeric, NOW()
+        )
+        ON CONFLICT (user_id, symbol)
+        DO UPDATE SET
+            units = i.units + EXCLUDED.units,
+            cost_basis = i.cost_basis + EXCLUDED.cost_basis,
+            avg_buy_price = CASE
+                WHEN i.units + EXCLUDED.units > 0
+                THEN (i.cost_basis + EXCLUDED.cost_basis) / (i.units + EXCLUDED.units)
+                ELSE 0
+            END,
+            current_value = (i.units + EXCLUDED.units) * EXCLUDED.last_price,
+            last_price = EXCLUDED.last_price,
+            last_price_at = NOW()
+        RETURNING i.id
+    )
+    INSERT INTO transactions
+    (user_id, symbol, type, quantity, price, fees, executed_at, data_version)
+    SELECT %(user_id)s, %(symbol)s, %(type)s, %(quantity)s, %(price)s, %(fees)s, NOW(), %(data_version)s
+    FROM position
+    {_TRANSACTION_RETURNING}
+"""
+
+# Sell: reduce the position (proportional cost basis) only if enough units are
+# held - checked on the locked row - and record the transaction only if it was.
+# Returns no row when the sell is rejected.
+SELL_TRANSACTION_QUERY = f"""
+    WITH position AS (
+        UPDATE investments
+        SET units = units - %(quantity)s::numeric,
+            cost_basis = cost_basis - %(quantity)s::numeric / units * cost_basis,
+            current_value = (units - %(quantity)s::numeric) * %(price)s::numeric,
+            last_price = %(price)s::numeric,
+            last_price_at = NOW()
+        WHERE user_id = %(user_id)s AND symbol = %(symbol)s AND units >= %(quantity)s::numeric
+        RETURNING id, units
+    ), recorded AS (
+        INSERT INTO transactions
+        (user_id, symbol, type, quantity, price, fees, executed_at, data_version)
+        SELECT %(user_id)s, %(symbol)s, %(type)s, %(quantity)s, %(price)s, %(fees)s, NOW(), %(data_version)s
+        FROM position
+        {_TRANSACTION_RETURNING}
+    )
+    SELECT recorded.*, position.id AS investment_id, position.units AS remaining_units
+    FROM recorded, position
+"""
+
+
+def apply_transaction(cur, user_id: int, transaction, data_version: int) -> Dict[str, Any]:
+    """
+    Record a transaction and apply it to the user's position atomically: buys
+    and sells are a single statement each (plus a DELETE when a sell closes the
+    position), so concurrent trades on one symbol serialize on the position row
+    instead of racing a read-modify-write.
+    Raises ValueError if a sell exceeds the units held.
+
+    Returns:
+        The new transaction row
+    """
+    params = {
+        "user_id": user_id,
+        "symbol": transaction.symbol,
+        "type": transaction.type.value,
+        "quantity": transaction.quantity,
+        "price": transaction.price,
+        "fees": transaction.fees,
+        "asset_type": transaction.asset_type.value,
+        "data_version": data_version
+    }
+
+    if transaction.type.value == "buy":
+        cur.execute(BUY_TRANSACTION_QUERY, params)
+        return cur.fetchone()
+
+    if transaction.type.value == "sell":
+        cur.execute(SELL_TRANSACTION_QUERY, params)
+        row = cur.fetchone()
+        if row is None:
+            cur.execute(
+                "SELECT 1 FROM investments WHERE user_id = %s AND symbol = %s",
+                (user_id, transaction.symbol)
+            )
+            if cur.fetchone() is None:
+                raise ValueError(f"You don't own any {transaction.symbol} to sell")
+            raise ValueError("Insufficient units to sell")
+        if row["remaining_units"] == 0:
+            cur.execute("DELETE FROM investments WHERE id = %s", (row["investment_id"],))
+        return {key: value for key, value in row.items() if key not in ("investment_id", "remaining_units")}
+
+    cur.execute(RECORD_TRANSACTION_QUERY, params)
+    return cur.fetchone()